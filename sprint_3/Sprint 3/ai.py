@@ -1,60 +1,690 @@
 #ai.py
 import math
-import copy
-from utils import evaluate_board
-from game_logic import Game
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game_logic import Game, PLAYERS
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Score of a won position; quicker wins score a little higher
+WIN_SCORE = 100000
+
+# How many nodes to search between clock checks
+BUDGET_CHECK_INTERVAL = 512
+
+# Half-width of the first aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 25
+
+# Quiescence nodes allowed below each horizon leaf
+QUIESCENCE_NODE_LIMIT = 64
+
+# Late move reductions: quiet moves after the first few, at this depth or more, lose a ply
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3
+
+# Frontier quiet moves are skipped when the static score plus this margin cannot reach alpha
+FUTILITY_MARGIN = 20
+
+class SearchAborted(Exception):
+    """Raised inside the search when the time or node budget runs out."""
 
 class AIPlayer:
-    def __init__(self, depth=3):
-        self.depth = depth
+    def __init__(self, depth=3, tt_size_mb=16, time_limit=None, node_limit=None, move_ordering=True,
+                 book=None, tablebase=None, workers=1, pvs=False, quiescence=False,
+                 quiescence_limit=QUIESCENCE_NODE_LIMIT, late_move_reductions=False, futility_pruning=False,
+                 stats_hook=None):
+        self.depth = depth  # Deepest iteration to search
+        self.time_limit = time_limit  # Seconds per move, or None
+        self.node_limit = node_limit  # Nodes per move, or None
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        self.orderer = MoveOrderer() if move_ordering else None
+        self.book = book  # An opening_book.OpeningBook, consulted before searching
+        self.tablebase = tablebase  # An endgame_tablebase.EndgameTablebase, probed at every node
+        self.workers = workers  # Processes sharing the root moves; 1 searches in this process
+        self.pvs = pvs  # Search with negamax PVS and aspiration windows instead of minimax
+        self.quiescence = quiescence  # Keep searching mill-closing moves past the horizon
+        self.quiescence_limit = quiescence_limit
+        self.quiescence_nodes = 0
+        self.quiescence_budget = 0
+        self.late_move_reductions = late_move_reductions  # Moving phase only
+        self.futility_pruning = futility_pruning  # Moving phase only
+        self.pruning = {'reductions': 0, 'researches': 0, 'futility': 0}
+        self.stats_hook = stats_hook  # Called with last_search after every move, e.g. a search_log.StatsLog
+        self.reset_counters(depth)
+        self.tt_size_mb = tt_size_mb
+        self.move_ordering = move_ordering
+        self.executor = None
+        self.shared_alpha = None
+        self.nodes = 0
+        self.searches = 0  # get_move calls that searched; workers start a new search when it changes
+        self.aborted = False
+        self.last_search = {}
+
+    def __getstate__(self):
+        # The process pool stays with the original player
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['shared_alpha'] = None
+        return state
+
+    def close(self):
+        """Shut down the worker processes of the parallel search."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def reset_counters(self, depth):
+        """Zero the per-search instrumentation counters."""
+        self.leaf_evaluations = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.ply_nodes = [0] * (depth + 1)  # Nodes at each ply of the current iteration
+
+    def search_counters(self):
+        """The instrumentation counters, for merging results of worker processes."""
+        return {'leaf_evaluations': self.leaf_evaluations, 'beta_cutoffs': self.beta_cutoffs,
+                'first_move_cutoffs': self.first_move_cutoffs, 'ply_nodes': self.ply_nodes}
+
+    def abort(self):
+        """Stop a search running in another thread; get_move returns its best move so far."""
+        self.aborted = True
+        self.next_budget_check = 0
 
     def get_move(self, game):
-        """Get the best move for the AI player."""
-        best_score = -math.inf
-        best_move = None
+        """Get the best move for the AI player by iterative deepening."""
+        self.aborted = False
         player = game.current_player
         possible_moves = game.get_possible_moves(player)
         if not possible_moves:
             return None  # No possible moves
+        if self.book is not None:
+            book_move = self.book.lookup(game)
+            if book_move is not None:
+                self.last_search = {'depth': 0, 'score': None, 'nodes': 0, 'time': 0.0, 'iterations': [],
+                                    'book': True}
+                if self.stats_hook is not None:
+                    self.stats_hook(self.last_search)
+                return book_move
+        self.searches += 1
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+            possible_moves = self.orderer.order(game, possible_moves, game.turn, 0)
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit if self.time_limit is not None else None
+        if self.aborted:
+            return possible_moves[0]
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.pruning = {'reductions': 0, 'researches': 0, 'futility': 0}
+        self.reset_counters(0)
+        ply_nodes = []
+        tt_counts = (self.tt.probes, self.tt.hits, self.tt.collisions) if self.tt is not None else None
+        tablebase_hits = self.tablebase.hits if self.tablebase is not None else 0
+        self.next_budget_check = math.inf  # The first iteration always completes
+        best_move = possible_moves[0]
+        self.last_search = {'depth': 0, 'score': None, 'nodes': 0, 'time': 0.0, 'iterations': []}
+        if self.workers > 1:
+            self.last_search['parallel'] = {'workers': self.workers, 'busy_time': 0.0, 'utilization': 0.0}
+        if self.pvs:
+            self.last_search['researches'] = 0  # Failed aspiration windows
+        # Search on the game itself, undoing every move afterwards
+        record_game, game.record_game = game.record_game, False  # Prevent recording during AI simulation
+        undo_depth = self.root_undo_depth = len(game.undo_stack)
+        try:
+            for depth in range(1, self.depth + 1):
+                self.ply_nodes = [0] * (depth + 1)
+                self.ply_nodes[0] = 1
+                try:
+                    if self.workers > 1:
+                        best_move, best_score = self.search_root_parallel(game, depth, possible_moves, player)
+                    elif self.pvs:
+                        best_move, best_score = self.search_root_aspiration(game, depth, possible_moves)
+                    else:
+                        best_move, best_score = self.search_root(game, depth, possible_moves, player)
+                except SearchAborted:
+                    while len(game.undo_stack) > undo_depth:
+                        game.unmake_move()
+                    break
+                elapsed = time.perf_counter() - start
+                self.last_search['depth'] = depth
+                self.last_search['score'] = best_score
+                self.last_search['iterations'].append((depth, best_move, best_score, self.nodes, elapsed))
+                ply_nodes = self.ply_nodes
+                # Try this iteration's best move first in the next one
+                possible_moves.remove(best_move)
+                possible_moves.insert(0, best_move)
+                self.next_budget_check = self.nodes
+                if self.deadline is not None and time.perf_counter() >= self.deadline:
+                    break
+        finally:
+            game.record_game = record_game
+        self.last_search['nodes'] = self.nodes
+        if self.quiescence:
+            self.last_search['quiescence_nodes'] = self.quiescence_nodes
+        if self.late_move_reductions or self.futility_pruning:
+            self.last_search['pruning'] = dict(self.pruning)
+        self.last_search['time'] = time.perf_counter() - start
+        if self.workers > 1 and self.last_search['time'] > 0:
+            parallel = self.last_search['parallel']
+            # Average number of busy workers, not a speedup over a sequential search
+            parallel['utilization'] = parallel['busy_time'] / self.last_search['time']
+        self.last_search.update(self.search_stats(ply_nodes, tt_counts, tablebase_hits))
+        if self.stats_hook is not None:
+            self.stats_hook(self.last_search)
+        return best_move
+
+    def search_stats(self, ply_nodes, tt_counts, tablebase_hits):
+        """Instrumentation of the search just finished, merged into last_search.
+
+        ply_nodes and the branching factors between consecutive plies come
+        from the last completed iteration; cache rates cover this search only.
+        """
+        elapsed = self.last_search['time']
+        previous = 0.0
+        depth_times = []
+        for _, _, _, _, finished in self.last_search['iterations']:
+            depth_times.append(finished - previous)
+            previous = finished
+        stats = {
+            'nps': self.nodes / elapsed if elapsed > 0 else 0.0,
+            'leaf_evaluations': self.leaf_evaluations,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0,
+            'ply_nodes': ply_nodes,
+            'branching_factors': [ply_nodes[ply + 1] / ply_nodes[ply] for ply in range(len(ply_nodes) - 1)
+                                  if ply_nodes[ply]],
+            'depth_times': depth_times,
+        }
+        if tt_counts is not None:
+            probes = self.tt.probes - tt_counts[0]
+            stats['tt'] = {'probes': probes,
+                           'hit_rate': (self.tt.hits - tt_counts[1]) / probes if probes else 0.0,
+                           'collision_rate': (self.tt.collisions - tt_counts[2]) / probes if probes else 0.0}
+        if self.book is not None:
+            lookups = self.book.hits + self.book.misses
+            stats['book_hit_rate'] = self.book.hits / lookups if lookups else 0.0
+        if self.tablebase is not None:
+            stats['tablebase_hits'] = self.tablebase.hits - tablebase_hits
+        return stats
+
+    def search_root(self, game, depth, possible_moves, player):
+        """Search every root move to the given depth; return (best move, score)."""
+        best_score = -math.inf
+        best_move = None
         for move in possible_moves:
-            temp_game = copy.deepcopy(game)
-            temp_game.record_game = False  # Prevent recording during AI simulation
-            temp_game.make_move(move)
-            score = self.minimax(temp_game, self.depth - 1, -math.inf, math.inf, False, player)
+            game.make_move(move)
+            score = self.minimax(game, depth - 1, best_score, math.inf, game.current_player == player, player)
+            game.unmake_move()
             if score > best_score:
                 best_score = score
                 best_move = move
-        return best_move
+        return best_move, best_score
+
+    def rank_moves(self, game, depth):
+        """Score every move of the player to move with a full-window search to depth.
+
+        Returns (move, score) pairs, best first. Raises SearchAborted, with
+        the game restored, when abort() is called meanwhile.
+        """
+        player = game.current_player
+        self.nodes = 0
+        self.reset_counters(depth)
+        self.deadline = None
+        self.next_budget_check = math.inf
+        self.root_undo_depth = len(game.undo_stack)
+        ranked = []
+        record_game, game.record_game = game.record_game, False
+        try:
+            for move in game.get_possible_moves(player):
+                game.make_move(move)
+                ranked.append((move, self.minimax(game, depth - 1, -math.inf, math.inf,
+                                                  game.current_player == player, player)))
+                game.unmake_move()
+        finally:
+            while len(game.undo_stack) > self.root_undo_depth:
+                game.unmake_move()
+            game.record_game = record_game
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+
+    def search_root_aspiration(self, game, depth, possible_moves):
+        """PVS root search in a window around the previous iteration's score; return (best move, score).
+
+        A score outside the window widens it fourfold and searches again,
+        until the window covers every score.
+        """
+        previous = self.last_search['score']
+        window = ASPIRATION_WINDOW if previous is not None and abs(previous) < WIN_SCORE else math.inf
+        while True:
+            low, high = (previous - window, previous + window) if window < WIN_SCORE else (-math.inf, math.inf)
+            best_move, best_score = self.search_root_window(game, depth, possible_moves, low, high)
+            if low < best_score < high:
+                return best_move, best_score
+            self.last_search['researches'] += 1
+            window *= 4
+
+    def search_root_window(self, game, depth, possible_moves, alpha, beta):
+        """Search the root moves with PVS inside (alpha, beta); return (best move, score)."""
+        best_score = -math.inf
+        best_move = None
+        for move_number, move in enumerate(possible_moves):
+            game.make_move(move)
+            score = self.search_child(game, depth - 1, alpha, beta, move_number)
+            game.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_move, best_score
+
+    def search_root_parallel(self, game, depth, possible_moves, player):
+        """Search the root moves in worker processes; return (best move, score).
+
+        Workers share the best score found so far as their alpha bound, so
+        a move scoring no more than the alpha it was searched with only has
+        an upper bound and never beats a move with an exact score. Ties go
+        to the move listed first, and an iteration in which any worker ran
+        out of budget raises SearchAborted.
+        """
+        if self.executor is None:
+            self.shared_alpha = multiprocessing.Value('d', -math.inf)
+            config = {'depth': self.depth, 'tt_size_mb': self.tt_size_mb, 'move_ordering': self.move_ordering,
+                      'tablebase': self.tablebase, 'pvs': self.pvs, 'quiescence': self.quiescence,
+                      'quiescence_limit': self.quiescence_limit, 'late_move_reductions': self.late_move_reductions,
+                      'futility_pruning': self.futility_pruning}
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_root_worker,
+                                                initargs=(config, self.shared_alpha))
+        self.shared_alpha.value = -math.inf
+        state = game.to_dict()
+        state['move_history'] = []
+        # The first iteration always completes, like the sequential search
+        deadline = None
+        if depth > 1 and self.deadline is not None:
+            deadline = time.time() + self.deadline - time.perf_counter()
+        node_limit = None
+        if depth > 1 and self.node_limit is not None:
+            node_limit = max(1, (self.node_limit - self.nodes) // len(possible_moves))
+        futures = [self.executor.submit(_search_root_move, state, move, depth, player, deadline, node_limit,
+                                        self.searches)
+                   for move in possible_moves]
+        results = {}
+        aborted = False
+        for future in as_completed(futures):
+            move, score, alpha, nodes, busy_time, counters = future.result()
+            self.nodes += nodes
+            self.leaf_evaluations += counters['leaf_evaluations']
+            self.beta_cutoffs += counters['beta_cutoffs']
+            self.first_move_cutoffs += counters['first_move_cutoffs']
+            for ply, count in enumerate(counters['ply_nodes']):
+                self.ply_nodes[ply] += count
+            self.last_search['parallel']['busy_time'] += busy_time
+            if score is None:
+                aborted = True
+            results[move] = (score, alpha)
+        if aborted:
+            raise SearchAborted()
+        return pick_root_move(possible_moves, results)
+
+    def check_budget(self):
+        """Abort the search once the time or node budget is spent."""
+        if self.aborted:
+            raise SearchAborted()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+        self.next_budget_check = self.nodes + BUDGET_CHECK_INTERVAL
+        if self.node_limit is not None:
+            self.next_budget_check = min(self.next_budget_check, self.node_limit)
 
     def minimax(self, game, depth, alpha, beta, maximizing_player, player):
         """Minimax algorithm with alpha-beta pruning."""
-        opponent = 'B' if player == 'W' else 'W'
-        if depth == 0 or game.is_over():
-            return evaluate_board(game.board, player)
-        possible_moves = game.get_possible_moves(player if maximizing_player else opponent)
+        self.nodes += 1
+        ply = len(game.undo_stack) - self.root_undo_depth
+        self.ply_nodes[ply] += 1
+        if self.nodes >= self.next_budget_check:
+            self.check_budget()
+        if game.is_over():
+            return WIN_SCORE + depth if game.winner == player else -WIN_SCORE - depth
+        if self.tablebase is not None and game.phase >= 2:
+            result = self.tablebase.probe(game)
+            if result is not None:
+                outcome, distance = result
+                if outcome == 'draw':
+                    return 0
+                # Score like a terminal position reached distance plies further on
+                score = WIN_SCORE + depth - distance
+                return score if (outcome == 'win') == maximizing_player else -score
+        if depth == 0:
+            if self.quiescence:
+                self.quiescence_budget = self.nodes + self.quiescence_limit
+                if maximizing_player:
+                    return self.quiesce(game, alpha, beta)
+                return -self.quiesce(game, -beta, -alpha)
+            self.leaf_evaluations += 1
+            return game.evaluate(player)
+        mover = game.current_player
+        # The table keeps scores and bounds from the mover's point of view
+        sign = 1 if maximizing_player else -1
+        low, high = (alpha, beta) if maximizing_player else (-beta, -alpha)
+        key = game.zobrist_hash
+        tt_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(key)
+            if entry is not None:
+                entry_depth, bound, score, tt_move = entry
+                if entry_depth >= depth:
+                    if bound == EXACT:
+                        return sign * score
+                    narrowed_low, narrowed_high = low, high
+                    if bound == LOWER_BOUND:
+                        narrowed_low = max(low, score)
+                    else:
+                        narrowed_high = min(high, score)
+                    if narrowed_low >= narrowed_high:
+                        return sign * score
+                    if maximizing_player:
+                        alpha, beta = narrowed_low, narrowed_high
+                    else:
+                        alpha, beta = -narrowed_high, -narrowed_low
+        possible_moves = game.get_possible_moves(mover)
         if not possible_moves:
-            return evaluate_board(game.board, player)
+            # A player who cannot move loses
+            return -WIN_SCORE - depth if maximizing_player else WIN_SCORE + depth
+        if self.orderer is not None:
+            possible_moves = self.orderer.order(game, possible_moves, PLAYERS.index(mover), ply, tt_move)
+        elif tt_move in possible_moves:
+            possible_moves.remove(tt_move)
+            possible_moves.insert(0, tt_move)
+        player_index = PLAYERS.index(mover)
+        futile = self.is_futile(game, depth, alpha if maximizing_player else -beta)
+        best_move = None
         if maximizing_player:
             max_eval = -math.inf
-            for move in possible_moves:
-                temp_game = copy.deepcopy(game)
-                temp_game.record_game = False  # Prevent recording during AI simulation
-                temp_game.make_move(move)
-                eval = self.minimax(temp_game, depth - 1, alpha, beta, False, player)
-                max_eval = max(max_eval, eval)
+            for move_number, move in enumerate(possible_moves):
+                child_depth = self.late_move_depth(game, move, move_number, depth, futile, player_index)
+                if child_depth is None:
+                    continue
+                game.make_move(move)
+                eval = self.minimax(game, child_depth, alpha, beta, game.current_player == player, player)
+                if child_depth < depth - 1 and eval > alpha:
+                    self.pruning['researches'] += 1
+                    eval = self.minimax(game, depth - 1, alpha, beta, game.current_player == player, player)
+                game.unmake_move()
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.count_cutoff(move_number)
+                    if self.orderer is not None:
+                        self.orderer.record_cutoff(move, ply, depth, move_number)
                     break
-            return max_eval
+            result = max_eval
         else:
             min_eval = math.inf
-            for move in possible_moves:
-                temp_game = copy.deepcopy(game)
-                temp_game.record_game = False  # Prevent recording during AI simulation
-                temp_game.make_move(move)
-                eval = self.minimax(temp_game, depth - 1, alpha, beta, True, player)
-                min_eval = min(min_eval, eval)
+            for move_number, move in enumerate(possible_moves):
+                child_depth = self.late_move_depth(game, move, move_number, depth, futile, player_index)
+                if child_depth is None:
+                    continue
+                game.make_move(move)
+                eval = self.minimax(game, child_depth, alpha, beta, game.current_player == player, player)
+                if child_depth < depth - 1 and eval < beta:
+                    self.pruning['researches'] += 1
+                    eval = self.minimax(game, depth - 1, alpha, beta, game.current_player == player, player)
+                game.unmake_move()
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.count_cutoff(move_number)
+                    if self.orderer is not None:
+                        self.orderer.record_cutoff(move, ply, depth, move_number)
                     break
-            return min_eval
+            result = min_eval
+        if self.tt is not None:
+            score = sign * result
+            if score <= low:
+                bound = UPPER_BOUND
+            elif score >= high:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.tt.store(key, depth, bound, score, best_move)
+        return result
+
+    def search_child(self, game, depth, alpha, beta, move_number):
+        """Negamax score of a move just made, for the side that made it.
+
+        Moves after the first are tried with a null window and searched
+        again with the full window only when they might beat alpha.
+        """
+        if move_number > 0 and alpha > -math.inf:
+            score = -self.negamax(game, depth, -alpha - 1, -alpha)
+            if score <= alpha or score >= beta:
+                return score
+        return -self.negamax(game, depth, -beta, -alpha)
+
+    def negamax(self, game, depth, alpha, beta):
+        """Alpha-beta in negamax form; scores are from the point of view of the player to move."""
+        self.nodes += 1
+        ply = len(game.undo_stack) - self.root_undo_depth
+        self.ply_nodes[ply] += 1
+        if self.nodes >= self.next_budget_check:
+            self.check_budget()
+        mover = game.current_player
+        if game.is_over():
+            return WIN_SCORE + depth if game.winner == mover else -WIN_SCORE - depth
+        if self.tablebase is not None and game.phase >= 2:
+            result = self.tablebase.probe(game)
+            if result is not None:
+                outcome, distance = result
+                if outcome == 'draw':
+                    return 0
+                score = WIN_SCORE + depth - distance
+                return score if outcome == 'win' else -score
+        if depth == 0:
+            if self.quiescence:
+                self.quiescence_budget = self.nodes + self.quiescence_limit
+                return self.quiesce(game, alpha, beta)
+            self.leaf_evaluations += 1
+            return game.evaluate(mover)
+        low, high = alpha, beta
+        key = game.zobrist_hash
+        tt_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(key)
+            if entry is not None:
+                entry_depth, bound, score, tt_move = entry
+                if entry_depth >= depth:
+                    if bound == EXACT:
+                        return score
+                    if bound == LOWER_BOUND:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if alpha >= beta:
+                        return score
+        possible_moves = game.get_possible_moves(mover)
+        if not possible_moves:
+            # A player who cannot move loses
+            return -WIN_SCORE - depth
+        if self.orderer is not None:
+            possible_moves = self.orderer.order(game, possible_moves, PLAYERS.index(mover), ply, tt_move)
+        elif tt_move in possible_moves:
+            possible_moves.remove(tt_move)
+            possible_moves.insert(0, tt_move)
+        player_index = PLAYERS.index(mover)
+        futile = self.is_futile(game, depth, alpha)
+        best_score = -math.inf
+        best_move = None
+        for move_number, move in enumerate(possible_moves):
+            child_depth = self.late_move_depth(game, move, move_number, depth, futile, player_index)
+            if child_depth is None:
+                continue
+            game.make_move(move)
+            score = self.search_child(game, child_depth, alpha, beta, move_number)
+            if child_depth < depth - 1 and score > alpha:
+                self.pruning['researches'] += 1
+                score = self.search_child(game, depth - 1, alpha, beta, move_number)
+            game.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.count_cutoff(move_number)
+                if self.orderer is not None:
+                    self.orderer.record_cutoff(move, ply, depth, move_number)
+                break
+        if self.tt is not None:
+            if best_score <= low:
+                bound = UPPER_BOUND
+            elif best_score >= high:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.tt.store(key, depth, bound, best_score, best_move)
+        return best_score
+
+    def count_cutoff(self, move_number):
+        self.beta_cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+
+    def is_futile(self, game, depth, mover_alpha):
+        """Whether quiet moves at this frontier node cannot lift the mover's score above mover_alpha."""
+        if not self.futility_pruning or depth != 1 or game.phase < 2:
+            return False
+        return game.evaluate(game.current_player) + FUTILITY_MARGIN <= mover_alpha
+
+    def late_move_depth(self, game, move, move_number, depth, futile, player_index):
+        """Depth to search a move to after late move reductions, or None when futility prunes it.
+
+        The first move, and moves that close or block a mill, always get
+        the full depth.
+        """
+        if move_number == 0 or game.phase < 2 or not (futile or self.late_move_reductions):
+            return depth - 1
+        if move[-2] == 'remove' or game.blocks_mill(player_index, move):
+            return depth - 1
+        if futile:
+            self.pruning['futility'] += 1
+            return None
+        if depth >= LMR_MIN_DEPTH and move_number >= LMR_FULL_DEPTH_MOVES:
+            self.pruning['reductions'] += 1
+            return depth - 2
+        return depth - 1
+
+    def quiesce(self, game, alpha, beta):
+        """Search only mill-closing moves until the position is quiet; scores are for the player to move.
+
+        The player to move may also stand pat on the static evaluation.
+        Once the leaf's quiescence budget is spent every position counts
+        as quiet.
+        """
+        mover = game.current_player
+        possible_moves = game.get_possible_moves(mover)
+        if not possible_moves:
+            return -WIN_SCORE
+        best_score = game.evaluate(mover)
+        self.leaf_evaluations += 1
+        if best_score >= beta or self.nodes >= self.quiescence_budget:
+            return best_score
+        alpha = max(alpha, best_score)
+        for move in possible_moves:
+            if move[-2] != 'remove':
+                continue
+            self.nodes += 1
+            self.quiescence_nodes += 1
+            if self.nodes >= self.next_budget_check:
+                self.check_budget()
+            game.make_move(move)
+            score = WIN_SCORE if game.is_over() else -self.quiesce(game, -beta, -alpha)
+            game.unmake_move()
+            if score > best_score:
+                best_score = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_score
+
+    def tt_stats(self):
+        """Transposition table usage, or None when the table is disabled."""
+        return self.tt.stats() if self.tt is not None else None
+
+    def ordering_stats(self):
+        """Cutoff counters of the move orderer, or None when ordering is disabled."""
+        return self.orderer.stats() if self.orderer is not None else None
+
+# Per-process state of the parallel root search
+_worker_ai = None
+_worker_alpha = None
+_worker_search = None
+
+def _init_root_worker(config, shared_alpha):
+    global _worker_ai, _worker_alpha, _worker_search
+    _worker_ai = AIPlayer(**config)
+    _worker_alpha = shared_alpha
+    _worker_search = None
+
+def pick_root_move(possible_moves, results):
+    """The best (move, score) of a parallel root search, given {move: (score, alpha searched with)}.
+
+    Scores at or below their alpha are fail-low upper bounds and only
+    count when no move has an exact score.
+    """
+    def key(move):
+        score, alpha = results[move]
+        return score > alpha, score, -possible_moves.index(move)
+    best_move = max(possible_moves, key=key)
+    return best_move, results[best_move][0]
+
+def _search_root_move(state, move, depth, player, deadline, node_limit, search=None):
+    """Search one root move in a worker.
+
+    The worker's tables are aged, as get_move does, the first time it
+    sees a task of a new search.
+
+    Returns (move, score or None if aborted, the alpha it was searched
+    with, nodes, seconds, counters).
+    """
+    global _worker_search
+    start = time.perf_counter()
+    ai = _worker_ai
+    if search is None or search != _worker_search:
+        _worker_search = search
+        if ai.tt is not None:
+            ai.tt.new_search()
+        if ai.orderer is not None:
+            ai.orderer.new_search()
+    game = Game()
+    game.from_dict(state)
+    ai.nodes = 0
+    ai.reset_counters(depth)
+    ai.node_limit = node_limit
+    ai.deadline = None if deadline is None else start + deadline - time.time()
+    ai.next_budget_check = BUDGET_CHECK_INTERVAL if ai.deadline is not None or node_limit is not None else math.inf
+    if node_limit is not None:
+        ai.next_budget_check = min(ai.next_budget_check, node_limit)
+    ai.root_undo_depth = 0
+    alpha = _worker_alpha.value
+    game.make_move(move)
+    try:
+        if ai.pvs:
+            score = -ai.negamax(game, depth - 1, -math.inf, -alpha)
+        else:
+            score = ai.minimax(game, depth - 1, alpha, math.inf, game.current_player == player, player)
+    except SearchAborted:
+        score = None
+    if score is not None:
+        with _worker_alpha.get_lock():
+            if score > _worker_alpha.value:
+                _worker_alpha.value = score
+    return move, score, alpha, ai.nodes, time.perf_counter() - start, ai.search_counters()
@@ -0,0 +1,73 @@
+#ai_worker.py
+import queue
+import threading
+from game_logic import Game
+
+class CancellationToken:
+    """Calls off one background search; the result of a cancelled search is dropped."""
+
+    def __init__(self, ai_player):
+        self.ai_player = ai_player
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.ai_player.abort()
+
+class AIWorker:
+    """Runs AI searches in a background thread and hands the moves back through a queue.
+
+    The search works on a copy of the game, so the caller's game can be
+    drawn, replayed or replaced meanwhile. Only one search runs at a time.
+    """
+
+    def __init__(self, ai_player):
+        self.ai_player = ai_player
+        self.results = queue.Queue()
+        self.thread = None
+        self.token = None
+
+    def start(self, game):
+        """Start searching the game's position; return the search's cancellation token."""
+        self.stop()
+        state = game.to_dict()
+        state['move_history'] = []
+        self.token = CancellationToken(self.ai_player)
+        self.thread = threading.Thread(target=self.run, args=(state, self.token), daemon=True)
+        self.thread.start()
+        return self.token
+
+    def run(self, state, token):
+        game = Game()
+        game.from_dict(state)
+        game.record_game = False
+        move = None if token.cancelled else self.ai_player.get_move(game)
+        if not token.cancelled:
+            self.results.put((token, move))
+
+    def poll(self):
+        """Return (True, move) once the current search has finished, else (False, None)."""
+        while True:
+            try:
+                token, move = self.results.get_nowait()
+            except queue.Empty:
+                return False, None
+            if token is self.token and not token.cancelled:
+                return True, move
+
+    @property
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def cancel(self):
+        """Cancel the current search without waiting for it."""
+        if self.token is not None:
+            self.token.cancel()
+
+    def stop(self):
+        """Cancel the current search and wait until its thread has finished."""
+        self.cancel()
+        while self.busy:
+            self.ai_player.abort()
+            self.thread.join(0.01)
+        self.thread = None
@@ -0,0 +1,227 @@
+#arena.py
+import argparse
+import ast
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ai import AIPlayer
+from endgame_tablebase import EndgameTablebase
+from game_logic import Game, PLAYERS
+from mcts import MCTSPlayer
+from opening_book import OpeningBook
+
+ENGINES = {'ai': AIPlayer, 'mcts': MCTSPlayer}
+# Games still running after this many plies are drawn
+MAX_PLIES = 200
+# A position seen this many times draws the game
+REPETITIONS = 3
+# Random plies played before the engines take over
+OPENING_PLIES = 4
+# Two-sided 95% normal quantile
+CONFIDENCE_Z = 1.96
+RESULTS = ('1-0', '0-1', '1/2-1/2')
+
+def parse_engine(spec):
+    """Split an engine spec such as 'ai:depth=4,pvs=True' into (name, keyword arguments)."""
+    name, _, options = spec.partition(':')
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}; choose from {', '.join(ENGINES)}.")
+    kwargs = {}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        try:
+            kwargs[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            kwargs[key.strip()] = value.strip()
+    return name, kwargs
+
+def create_engine(spec, time_limit=None):
+    """Build the player an engine spec describes; book and tablebase options name files."""
+    name, kwargs = parse_engine(spec)
+    if time_limit is not None:
+        kwargs['time_limit'] = time_limit
+    if isinstance(kwargs.get('book'), str):
+        kwargs['book'] = OpeningBook(kwargs['book'])
+    if isinstance(kwargs.get('tablebase'), str):
+        kwargs['tablebase'] = EndgameTablebase(kwargs['tablebase'])
+    return ENGINES[name](**kwargs)
+
+def random_openings(count, plies=OPENING_PLIES, seed=None):
+    """count openings of up to plies random legal moves each."""
+    rng = random.Random(seed)
+    openings = []
+    for _ in range(count):
+        game = Game()
+        moves = []
+        for _ in range(plies):
+            possible = game.get_possible_moves(game.current_player)
+            if not possible:
+                break
+            move = rng.choice(possible)
+            game.make_move(move)
+            moves.append(move)
+            if game.check_win_condition():
+                break
+        openings.append(moves)
+    return openings
+
+def move_text(move):
+    """Short notation for a move: '@3' places on 3, '3-4' moves, 'x9' appended removes 9."""
+    text = f"@{move[1]}" if move[0] == 'place' else f"{move[1]}-{move[2]}"
+    if move[-2] == 'remove':
+        text += f"x{move[-1]}"
+    return text
+
+def movetext(moves, result):
+    """PGN-style movetext: numbered move pairs followed by the result."""
+    parts = []
+    for ply, move in enumerate(moves):
+        if ply % 2 == 0:
+            parts.append(f"{ply // 2 + 1}.")
+        parts.append(move_text(move))
+    return ' '.join(parts + [result])
+
+def play_game(index, white, black, opening=(), time_limit=None, max_plies=MAX_PLIES):
+    """Play one game between two engine specs from an opening; return its record."""
+    engines = [create_engine(white, time_limit), create_engine(black, time_limit)]
+    game = Game()
+    moves = []
+    think_times = [0.0, 0.0]
+    seen = {}
+    start = time.perf_counter()
+    try:
+        for move in opening:
+            game.make_move(move)
+            moves.append(move)
+        game.check_win_condition()
+        while not game.is_over() and len(moves) < max_plies:
+            seen[game.zobrist_hash] = seen.get(game.zobrist_hash, 0) + 1
+            if seen[game.zobrist_hash] >= REPETITIONS:
+                break
+            mover = game.turn
+            move_start = time.perf_counter()
+            move = engines[mover].get_move(game)
+            think_times[mover] += time.perf_counter() - move_start
+            if move is None:
+                game.winner = PLAYERS[mover ^ 1]
+                break
+            game.make_move(move)
+            moves.append(move)
+            game.check_win_condition()
+    finally:
+        for engine in engines:
+            engine.close()
+    result = RESULTS[2] if game.winner is None else RESULTS[PLAYERS.index(game.winner)]
+    return {
+        'game': index,
+        'white': white,
+        'black': black,
+        'opening_plies': len(opening),
+        'moves': [list(move) for move in moves],
+        'movetext': movetext(moves, result),
+        'result': result,
+        'plies': len(moves),
+        'time': time.perf_counter() - start,
+        'think_time': {'W': think_times[0], 'B': think_times[1]},
+    }
+
+def engine_score(record, engine):
+    """1, 0.5 or 0: the game's result for the engine spec playing it."""
+    if record['result'] == RESULTS[2]:
+        return 0.5
+    return 1.0 if (record['result'] == RESULTS[0]) == (record['white'] == engine) else 0.0
+
+def score_interval(wins, draws, losses, z=CONFIDENCE_Z):
+    """Mean score and the half-width of its normal confidence interval."""
+    games = wins + draws + losses
+    if not games:
+        return 0.5, 0.5
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, z * math.sqrt(variance / games)
+
+def elo_difference(score):
+    """Elo difference implied by a mean score, clamped away from +-infinity."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def summary(wins, draws, losses):
+    """W/D/L line with the score and Elo difference and their 95% intervals."""
+    games = wins + draws + losses
+    score, margin = score_interval(wins, draws, losses)
+    elo = elo_difference(score)
+    low, high = elo_difference(score - margin), elo_difference(score + margin)
+    rates = ' '.join(f"{name} {count} ({count / max(games, 1):.1%})"
+                     for name, count in (('W', wins), ('D', draws), ('L', losses)))
+    return (f"{games} games: {rates}; score {score:.3f} +- {margin:.3f}; "
+            f"Elo {elo:+.0f} [{low:+.0f}, {high:+.0f}]")
+
+def game_tasks(engine, opponent, games, openings):
+    """(index, white, black, opening) for every game; each opening is played twice with colours swapped."""
+    for index in range(games):
+        pair, swapped = divmod(index, 2)
+        white, black = (opponent, engine) if swapped else (engine, opponent)
+        yield index, white, black, openings[pair % len(openings)]
+
+def run_match(engine, opponent, games, workers, openings, time_limit=None, max_plies=MAX_PLIES,
+              output=None, progress=None):
+    """Play a match across worker processes; return engine's (wins, draws, losses).
+
+    Every finished game is appended to output as a JSON line and passed
+    to progress(record, wins, draws, losses) as it arrives.
+    """
+    tally = [0, 0, 0]
+    log = open(output, 'a') if output else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_game, index, white, black, opening, time_limit, max_plies)
+                       for index, white, black, opening in game_tasks(engine, opponent, games, openings)]
+            for future in as_completed(futures):
+                record = future.result()
+                tally[{1.0: 0, 0.5: 1, 0.0: 2}[engine_score(record, engine)]] += 1
+                if log:
+                    log.write(json.dumps(record) + '\n')
+                    log.flush()
+                if progress:
+                    progress(record, *tally)
+    finally:
+        if log:
+            log.close()
+    return tuple(tally)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine against engine without the GUI.")
+    parser.add_argument('engine', help="engine under test, e.g. 'ai:depth=6,pvs=True' or 'mcts:playouts=500'")
+    parser.add_argument('opponent', help="reference engine, in the same form")
+    parser.add_argument('--games', type=int, default=100, help="games to play; openings are played in colour-swapped pairs")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--time-limit', type=float, help="seconds per move for both engines")
+    parser.add_argument('--opening-plies', type=int, default=OPENING_PLIES, help="random plies before the engines play")
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help="draw games that run longer")
+    parser.add_argument('--seed', type=int, help="seed for the random openings")
+    parser.add_argument('--output', default='arena.jsonl', help="JSON Lines file the games are appended to")
+    args = parser.parse_args()
+    if args.engine == args.opponent:
+        parser.error("the two engine specs must differ")
+    for spec in (args.engine, args.opponent):
+        try:
+            parse_engine(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    openings = random_openings((args.games + 1) // 2, args.opening_plies, args.seed)
+    start = time.perf_counter()
+
+    def progress(record, wins, draws, losses):
+        print(f"game {record['game']}: {record['result']} in {record['plies']} plies ({record['time']:.2f}s); "
+              f"{summary(wins, draws, losses)}", flush=True)
+
+    wins, draws, losses = run_match(args.engine, args.opponent, args.games, args.workers, openings,
+                                    args.time_limit, args.max_plies, args.output, progress)
+    print(f"\n{args.engine} vs {args.opponent} in {time.perf_counter() - start:.1f}s")
+    print(summary(wins, draws, losses))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#batch_eval.py
+import numpy as np
+from utils import (
+    BLOCKED_WEIGHT, MILL_WEIGHT, OPEN_TWO_WEIGHT, PIECE_WEIGHT, adjacency_list, mills
+)
+
+# Board arrays hold one int8 per position: EMPTY, WHITE or BLACK
+EMPTY = 0
+WHITE = 1
+BLACK = 2
+
+# Position-by-line and position-by-position incidence matrices
+MILL_MATRIX = np.zeros((24, len(mills)), dtype=np.int16)
+for _line, _mill in enumerate(mills):
+    MILL_MATRIX[_mill, _line] = 1
+ADJACENCY_MATRIX = np.zeros((24, 24), dtype=np.int16)
+for _pos, _neighbours in adjacency_list.items():
+    ADJACENCY_MATRIX[_pos, _neighbours] = 1
+
+BIT_VALUES = (1 << np.arange(24, dtype=np.int64))
+
+def boards_from_games(games):
+    """Stack the boards of Game objects into an (N, 24) int8 array."""
+    return unpack_bitboards(np.array([game.pieces for game in games], dtype=np.int64).reshape(-1, 2))
+
+def unpack_bitboards(bitboards):
+    """Turn an (N, 2) array of (white, black) bitboards into an (N, 24) int8 board array."""
+    bitboards = np.asarray(bitboards, dtype=np.int64)
+    white = (bitboards[:, 0:1] & BIT_VALUES) != 0
+    black = (bitboards[:, 1:2] & BIT_VALUES) != 0
+    return (white * WHITE + black * BLACK).astype(np.int8)
+
+def pack_bitboards(boards):
+    """Inverse of unpack_bitboards."""
+    boards = np.asarray(boards)
+    white = ((boards == WHITE) * BIT_VALUES).sum(axis=1)
+    black = ((boards == BLACK) * BIT_VALUES).sum(axis=1)
+    return np.stack([white, black], axis=1)
+
+def batch_features(boards):
+    """Evaluation features for every board, as an (N, 6) array.
+
+    Columns follow utils.local_features: mills, open twos and blocked
+    pieces, white before black in each pair.
+    """
+    boards = np.asarray(boards)
+    white = (boards == WHITE).astype(np.int16)
+    black = (boards == BLACK).astype(np.int16)
+    white_lines = white @ MILL_MATRIX
+    black_lines = black @ MILL_MATRIX
+    empty = 1 - white - black
+    no_empty_neighbour = (empty @ ADJACENCY_MATRIX) == 0
+    return np.stack([
+        (white_lines == 3).sum(axis=1),
+        (black_lines == 3).sum(axis=1),
+        ((white_lines == 2) & (black_lines == 0)).sum(axis=1),
+        ((black_lines == 2) & (white_lines == 0)).sum(axis=1),
+        ((white == 1) & no_empty_neighbour).sum(axis=1),
+        ((black == 1) & no_empty_neighbour).sum(axis=1),
+    ], axis=1)
+
+def evaluate_boards(boards, player='W'):
+    """Score many positions at once, matching utils.evaluate_board on each.
+
+    boards is an (N, 24) int8 array of EMPTY/WHITE/BLACK, or an (N, 2) array
+    of (white, black) bitboards. player is 'W', 'B', or one of them per row.
+    Returns an (N,) int32 array.
+    """
+    boards = np.asarray(boards)
+    if boards.ndim == 2 and boards.shape[1] == 2:
+        boards = unpack_bitboards(boards)
+    features = batch_features(boards).astype(np.int32)
+    white_pieces = (boards == WHITE).sum(axis=1)
+    black_pieces = (boards == BLACK).sum(axis=1)
+    scores = (PIECE_WEIGHT * (white_pieces - black_pieces)
+              + MILL_WEIGHT * (features[:, 0] - features[:, 1])
+              + OPEN_TWO_WEIGHT * (features[:, 2] - features[:, 3])
+              - BLOCKED_WEIGHT * (features[:, 4] - features[:, 5])).astype(np.int32)
+    if isinstance(player, str):
+        return scores if player == 'W' else -scores
+    return np.where(np.asarray(player) == 'W', scores, -scores).astype(np.int32)
@@ -0,0 +1,244 @@
+#batch_game.py
+import numpy as np
+from batch_eval import ADJACENCY_MATRIX, EMPTY, MILL_MATRIX
+from game_logic import Game, PLAYERS
+from utils import mills, mills_by_position
+
+# A move is (source, destination, removal); HAND as source places a piece, NO_REMOVAL skips the removal
+HAND = 24
+NO_REMOVAL = 24
+# Winner values besides the player indexes
+NO_WINNER = -1
+DRAW = 2
+
+ADJACENT = ADJACENCY_MATRIX.astype(bool)
+# The two lines through each destination
+DESTINATION_LINES = np.array([[mills.index(mill) for mill in mills_by_position[pos]] for pos in range(24)],
+                             dtype=np.intp)  # (24, 2)
+# 1 where the moving piece itself sits on a line through the destination; the HAND row stays 0
+SOURCE_IN_LINE = np.zeros((25, 24, 2), dtype=np.int16)
+SOURCE_IN_LINE[:24] = MILL_MATRIX[:, DESTINATION_LINES]
+# Line counts go through float32 matrix products, which use BLAS
+LINE_MATRIX = MILL_MATRIX.astype(np.float32)
+ADJACENCY_FLOAT = ADJACENCY_MATRIX.astype(np.float32)
+# Destinations a piece can step to from each source; a placement (HAND) reaches every point
+REACH = np.vstack([ADJACENT, np.ones((1, 24), dtype=bool)])
+
+class BatchGame:
+    """K games of Nine Men's Morris stepped in lockstep on NumPy arrays.
+
+    The rules follow game_logic.Game: a move that closes a mill removes an
+    opponent piece in the same step, pieces in mills are protected while
+    others are available, a player with three pieces flies, and after
+    every move a player left with fewer than three pieces or no legal move
+    in the moving phase loses. Finished games keep their state and ignore
+    further moves.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.board = np.zeros((count, 24), dtype=np.int8)
+        self.turn = np.zeros(count, dtype=np.int8)
+        self.in_hand = np.full((count, 2), 9, dtype=np.int8)
+        self.on_board = np.zeros((count, 2), dtype=np.int8)
+        self.winner = np.full(count, NO_WINNER, dtype=np.int8)
+        self.plies = np.zeros(count, dtype=np.int32)
+        self._legal = None
+        self._counts = None
+
+    @classmethod
+    def from_games(cls, games):
+        """A batch holding the positions of game_logic.Game objects."""
+        batch = cls(len(games))
+        for index, game in enumerate(games):
+            batch.board[index] = [EMPTY if piece == ' ' else PLAYERS.index(piece) + 1 for piece in game.board]
+            batch.turn[index] = game.turn
+            batch.in_hand[index] = game.pieces_in_hand
+            batch.on_board[index] = game.pieces_on_board
+            if game.winner is not None:
+                batch.winner[index] = PLAYERS.index(game.winner)
+        return batch
+
+    def select(self, rows):
+        """A new batch with copies of the given games, in order; rows may repeat."""
+        batch = BatchGame(len(rows))
+        for name in ('board', 'turn', 'in_hand', 'on_board', 'winner', 'plies'):
+            setattr(batch, name, getattr(self, name)[rows])
+        return batch
+
+    @property
+    def active(self):
+        return self.winner == NO_WINNER
+
+    @property
+    def moving_phase(self):
+        return (self.in_hand[:, 0] == 0) & (self.in_hand[:, 1] == 0)
+
+    def legal_moves(self):
+        """Legal moves of the side to move in every game.
+
+        Returns (moves, closes, removable): moves[k, source, destination] is
+        True for each legal place (source HAND) or move, closes marks those
+        that complete a mill, and removable[k, position] lists the pieces
+        such a move may take. Finished games have no moves.
+        """
+        if self._legal is None:
+            self._legal = self._compute_legal_moves()
+        return self._legal
+
+    def _compute_legal_moves(self):
+        moves = np.zeros((self.count, 25, 24), dtype=bool)
+        closes = np.zeros((self.count, 25, 24), dtype=bool)
+        removable = np.zeros((self.count, 24), dtype=bool)
+        rows = np.flatnonzero(self.active)
+        own, empty, placing, moving, flying = (mask[rows] for mask in self._side_to_move())
+        other = ~own & ~empty
+
+        moves[rows, HAND, :] = empty & placing[:, None]
+        reach = ADJACENT[None, :, :] | flying[:, None, None]
+        moves[rows, :HAND, :] = own[:, :, None] & empty[:, None, :] & reach & moving[:, None, None]
+
+        # A move closes a mill when a line through the destination already holds two own
+        # pieces and the moving piece is not one of them
+        own_lines = own.astype(np.float32) @ LINE_MATRIX
+        completes = (own_lines[:, DESTINATION_LINES] == 2)[:, None, :, :] & (SOURCE_IN_LINE == 0)
+        closes[rows] = (completes[..., 0] | completes[..., 1]) & moves[rows] & other.any(axis=1)[:, None, None]
+        removable[rows] = _removable(other)
+        return moves, closes, removable
+
+    def _side_to_move(self):
+        """(own, empty, placing, moving, flying) masks of the side to move in every game."""
+        index = np.arange(self.count)
+        own = self.board == (self.turn + 1)[:, None]
+        empty = self.board == EMPTY
+        moving = self.moving_phase
+        placing = ~moving & (self.in_hand[index, self.turn] > 0)
+        flying = moving & (self.on_board[index, self.turn] == 3)
+        return own, empty, placing, moving, flying
+
+    def source_counts(self):
+        """counts[k, source]: how many legal destinations each source (HAND for placements) has.
+
+        This is all apply and random_moves need, so the dense masks of
+        legal_moves are only built when asked for. Finished games count 0.
+        """
+        if self._counts is None:
+            own, empty, placing, moving, flying = self._side_to_move()
+            free = empty.sum(axis=1)
+            reachable = np.where(flying[:, None], free[:, None], empty.astype(np.float32) @ ADJACENCY_FLOAT)
+            counts = np.zeros((self.count, 25), dtype=np.int16)
+            counts[:, :HAND] = reachable * (own & moving[:, None])
+            counts[:, HAND] = free * placing
+            counts[~self.active] = 0
+            self._counts = counts
+        return self._counts
+
+    def apply(self, source, destination, removal):
+        """Play one move in every unfinished game.
+
+        source, destination and removal are length-K integer arrays; removal
+        is only read where the move closes a mill.
+        """
+        rows = np.flatnonzero(self.active)
+        index = np.arange(len(rows))
+        source = np.asarray(source)[rows]
+        destination = np.asarray(destination)[rows]
+        removal = np.asarray(removal)[rows]
+        mover = self.turn[rows].astype(np.intp)
+        own, empty, placing, moving, flying = (mask[rows] for mask in self._side_to_move())
+        other = ~own & ~empty
+        placed = source == HAND
+        stepped = own[index, np.minimum(source, HAND - 1)] & (flying | REACH[source, destination])
+        if not (empty[index, destination] & np.where(placed, placing, moving & stepped)).all():
+            raise ValueError("Illegal move in batch.")
+        capture = _closes(own, other, source, destination)
+        taken = removal[capture]
+        if not ((taken >= 0) & (taken < NO_REMOVAL)).all():
+            raise ValueError("A move that closes a mill must remove an opponent's piece.")
+        if not _removable(other[capture])[np.arange(len(taken)), taken].all():
+            raise ValueError("Illegal removal in batch.")
+
+        self.board[rows, destination] = mover + 1
+        moved = ~placed
+        self.board[rows[moved], source[moved]] = EMPTY
+        self.in_hand[rows[placed], mover[placed]] -= 1
+        self.on_board[rows[placed], mover[placed]] += 1
+        self.board[rows[capture], removal[capture]] = EMPTY
+        self.on_board[rows[capture], 1 - mover[capture]] -= 1
+        self.turn[rows] ^= 1
+        self.plies[rows] += 1
+        self._legal = None
+        self._counts = None
+
+        # Same order as Game.check_win_condition
+        moving = self.moving_phase[rows]
+        black_short = moving & (self.on_board[rows, 1] < 3)
+        white_short = moving & ~black_short & (self.on_board[rows, 0] < 3)
+        self.winner[rows[black_short]] = 0
+        self.winner[rows[white_short]] = 1
+        stuck = moving & ~black_short & ~white_short & ~self.source_counts()[rows].any(axis=1)
+        self.winner[rows[stuck]] = 1 - self.turn[rows[stuck]]
+        if stuck.any():
+            self._legal = None
+            self._counts = None
+
+    def random_moves(self, rng):
+        """Pick a uniformly random place/move per game, and a random removal when it closes a mill."""
+        # A source drawn in proportion to its destinations, then one of them, is uniform over moves
+        source = _random_index(self.source_counts(), rng)
+        own, empty, placing, moving, flying = self._side_to_move()
+        destination = _random_index(empty & (REACH[source] | flying[:, None]), rng)
+        other = ~own & ~empty
+        removal = _random_index(_removable(other), rng)
+        removal = np.where(_closes(own, other, source, destination), removal, NO_REMOVAL)
+        return source, destination, removal
+
+    def play_random(self, rng, max_plies=200):
+        """Play every game out with random moves; games still running after max_plies are draws."""
+        while self.active.any():
+            running = self.active & (self.plies < max_plies)
+            if not running.any():
+                break
+            self.winner[self.active & ~running] = DRAW
+            self.apply(*self.random_moves(rng))
+        self.winner[self.active] = DRAW
+        return self.winner
+
+    def move_tuple(self, source, destination, removal):
+        """The game_logic move for a (source, destination, removal)."""
+        move = ('place', int(destination)) if source == HAND else ('move', int(source), int(destination))
+        if removal != NO_REMOVAL:
+            move += ('remove', int(removal))
+        return move
+
+    def game(self, index):
+        """Build a game_logic.Game holding one game's position."""
+        game = Game()
+        game.board = [' ' if value == EMPTY else PLAYERS[value - 1] for value in self.board[index].tolist()]
+        game.white_pieces_in_hand, game.black_pieces_in_hand = self.in_hand[index].tolist()
+        game.white_pieces_on_board, game.black_pieces_on_board = self.on_board[index].tolist()
+        game.update_phase()
+        game.current_player = PLAYERS[self.turn[index]]
+        if self.winner[index] in (0, 1):
+            game.winner = PLAYERS[self.winner[index]]
+        game.compute_zobrist()
+        return game
+
+def _closes(own, other, source, destination):
+    """Whether each game's move closes a mill that can take a piece; arrays are aligned by game."""
+    lines = np.take_along_axis(own.astype(np.float32) @ LINE_MATRIX, DESTINATION_LINES[destination], axis=1)
+    completes = (lines == 2) & (SOURCE_IN_LINE[source, destination] == 0)
+    return completes.any(axis=1) & other.any(axis=1)
+
+def _removable(other):
+    """The opponent pieces a closed mill may take: those outside mills, or any if all are in mills."""
+    other_lines = other.astype(np.float32) @ LINE_MATRIX
+    protected = ((other_lines == 3).astype(np.float32) @ LINE_MATRIX.T) > 0
+    free = other & ~protected
+    return np.where(free.any(axis=1)[:, None], free, other)
+
+def _random_index(weights, rng):
+    """Column drawn in proportion to the weights in each row of a 2-D array (0 for all-zero rows)."""
+    counting = weights.cumsum(axis=1, dtype=np.int16)
+    target = (rng.random(len(weights)) * counting[:, -1]).astype(np.int16)
+    return (counting > target[:, None]).argmax(axis=1)
@@ -0,0 +1,61 @@
+#benchmark_eval.py
+import argparse
+import copy
+import time
+from ai import AIPlayer
+from benchmark_movegen import placing_position
+from game_logic import Game
+from perft import load_position
+from utils import evaluate_bitboards, position_masks, zobrist_pieces
+
+DEFAULT_DEPTH = 5
+POSITIONS = ('placing', 'moving', 'moving-black', 'flying')
+
+class ScratchGame(Game):
+    """Game without incremental evaluation: every leaf is scored from scratch."""
+
+    def toggle_piece(self, player_index, position):
+        self.pieces[player_index] ^= position_masks[position]
+        self._zobrist ^= zobrist_pieces[player_index][position]
+
+    def evaluate(self, player):
+        white, black = self.pieces
+        return evaluate_bitboards(white, black) if player == 'W' else evaluate_bitboards(black, white)
+
+def as_class(game, cls):
+    """A copy of game that is an instance of cls."""
+    result = cls.__new__(cls)
+    result.__dict__.update(copy.deepcopy(game.__dict__))
+    return result
+
+def search_rate(game, depth):
+    """(nodes, seconds, chosen move) of one fixed-depth search from game."""
+    player = AIPlayer(depth=depth)
+    start = time.perf_counter()
+    move = player.get_move(game)
+    return player.last_search['nodes'], time.perf_counter() - start, move
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare search speed with incremental and from-scratch evaluation.")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="search depth")
+    args = parser.parse_args()
+    totals = {Game: [0, 0.0], ScratchGame: [0, 0.0]}
+    for name in POSITIONS:
+        position = placing_position() if name == 'placing' else load_position(name)
+        results = {cls: search_rate(as_class(position, cls), args.depth) for cls in totals}
+        if results[Game][::2] != results[ScratchGame][::2]:
+            raise SystemExit(f"{name}: the two evaluations searched differently")
+        nodes = results[Game][0]
+        rates = {}
+        for cls, (nodes, seconds, _) in results.items():
+            totals[cls][0] += nodes
+            totals[cls][1] += seconds
+            rates[cls] = nodes / seconds
+        print(f"{name:<13} {nodes:>7} nodes: incremental {rates[Game]:,.0f} nps, "
+              f"from scratch {rates[ScratchGame]:,.0f} nps")
+    incremental, scratch = (nodes / seconds for nodes, seconds in totals.values())
+    print(f"{'all':<13} incremental {incremental:,.0f} nps, from scratch {scratch:,.0f} nps "
+          f"({incremental / scratch:.2f}x)")
+
+if __name__ == '__main__':
+    main()
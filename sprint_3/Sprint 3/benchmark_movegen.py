@@ -0,0 +1,83 @@
+#benchmark_movegen.py
+import argparse
+import random
+import time
+from game_logic import Game, PLAYERS
+from perft import PERFT_POSITIONS, load_position
+from utils import adjacency_masks, iter_bits
+
+# Calls of each generator per position
+DEFAULT_CALLS = 20000
+
+def scan_moves(game, player):
+    """Reference generator: every destination bit by bit, each checked with closes_mill.
+
+    Lists the same moves as Game.get_possible_moves, in board order.
+    """
+    player_index = PLAYERS.index(player)
+    empty = game.empty_squares()
+    candidates = []
+    if game.phase == 1:
+        if game.pieces_in_hand[player_index] > 0:
+            candidates = [('place', i) for i in iter_bits(empty)]
+    else:
+        flying = (game.black_phase if player_index else game.white_phase) == 3
+        for i in iter_bits(game.pieces[player_index]):
+            targets = empty if flying else adjacency_masks[i] & empty
+            candidates += [('move', i, j) for j in iter_bits(targets)]
+    removals = list(iter_bits(game.removable_pieces(player_index ^ 1)))
+    moves = []
+    for move in candidates:
+        if game.closes_mill(player_index, move) and game.pieces[player_index ^ 1]:
+            moves += [move + ('remove', r) for r in removals]
+        else:
+            moves.append(move)
+    return moves
+
+def scan_has_moves(game, player_index):
+    """Reference has_moves: looks for an empty neighbour one piece at a time."""
+    empty = game.empty_squares()
+    if not empty:
+        return False
+    if game.phase == 1:
+        return game.pieces_in_hand[player_index] > 0
+    if (game.black_phase if player_index else game.white_phase) == 3:
+        return game.pieces[player_index] != 0
+    return any(adjacency_masks[pos] & empty for pos in iter_bits(game.pieces[player_index]))
+
+def placing_position(plies=7, seed=1):
+    """A placing-phase Game after plies random moves."""
+    game = Game()
+    game.record_game = False
+    rng = random.Random(seed)
+    for _ in range(plies):
+        game.make_move(rng.choice(game.get_possible_moves(game.current_player)))
+    return game
+
+def time_calls(function, game, argument, calls):
+    """Seconds taken by calls calls of function(game, argument)."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        function(game, argument)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the table-driven move generator against a bit-by-bit scan.")
+    parser.add_argument('--calls', type=int, default=DEFAULT_CALLS, help="calls of each generator per position")
+    args = parser.parse_args()
+    positions = [('placing', placing_position())] + [(name, load_position(name)) for name in sorted(PERFT_POSITIONS)
+                                                     if PERFT_POSITIONS[name] is not None]
+    for name, game in positions:
+        player = game.current_player
+        moves = game.get_possible_moves(player)
+        if sorted(moves) != sorted(scan_moves(game, player)):
+            raise SystemExit(f"{name}: generators disagree")
+        generate = time_calls(Game.get_possible_moves, game, player, args.calls)
+        scan = time_calls(scan_moves, game, player, args.calls)
+        has = time_calls(Game.has_moves, game, game.turn, args.calls)
+        scan_has = time_calls(scan_has_moves, game, game.turn, args.calls)
+        print(f"{name:<13} {len(moves):>3} moves: get_possible_moves {generate:.3f}s vs scan {scan:.3f}s "
+              f"({scan / generate:.1f}x); has_moves {has:.3f}s vs scan {scan_has:.3f}s ({scan_has / has:.1f}x)")
+
+if __name__ == '__main__':
+    main()
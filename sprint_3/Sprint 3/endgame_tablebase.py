@@ -0,0 +1,361 @@
+#endgame_tablebase.py
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils import adjacency_masks, board_mask, iter_bits, mill_masks, position_mill_masks
+
+# One byte per position, from the side to move's point of view:
+# 0 = draw (or not a real position), 1-127 = win in that many plies, 128 + n = loss in n plies
+DRAW = 0
+LOSS = 128
+MAX_DISTANCE = 127
+
+SHARD_MAGIC = b'NMMTB001'
+SHARD_HEADER = struct.Struct('<8sBBI')  # magic, white count, black count, position count
+
+# White ranks per task when the initial pass is split between processes
+CHUNK_SIZE = 64
+# Positions per task when a level of the propagation is split between processes
+FRONTIER_CHUNK_SIZE = 4096
+
+def shard_filename(directory, white_count, black_count):
+    return os.path.join(directory, f'tb_{white_count}_{black_count}.bin')
+
+def win_value(distance):
+    return min(distance, MAX_DISTANCE)
+
+def loss_value(distance):
+    return LOSS + min(distance, MAX_DISTANCE)
+
+def decode_value(value):
+    """Return ('win' | 'loss' | 'draw', distance in plies) for a stored byte."""
+    if value == DRAW:
+        return 'draw', 0
+    if value < LOSS:
+        return 'win', value
+    return 'loss', value - LOSS
+
+def combination_masks(count):
+    """Every bitboard with count pieces, in ascending order."""
+    return sorted(sum(1 << pos for pos in combo) for combo in itertools.combinations(range(24), count))
+
+class ShardLayout:
+    """Maps (side to move, white bitboard, black bitboard) to a dense index.
+
+    Index = (turn * white combinations + white rank) * black combinations + black rank.
+    Overlapping white/black boards get an index too and simply stay draws.
+    """
+
+    def __init__(self, white_count, black_count):
+        self.white_count = white_count
+        self.black_count = black_count
+        self.white_masks = combination_masks(white_count)
+        self.black_masks = self.white_masks if black_count == white_count else combination_masks(black_count)
+        self.white_rank = {mask: rank for rank, mask in enumerate(self.white_masks)}
+        self.black_rank = self.white_rank if black_count == white_count else \
+            {mask: rank for rank, mask in enumerate(self.black_masks)}
+        self.size = 2 * len(self.white_masks) * len(self.black_masks)
+
+    def index(self, turn, white, black):
+        return (turn * len(self.white_masks) + self.white_rank[white]) * len(self.black_masks) + self.black_rank[black]
+
+    def position(self, index):
+        rest, black_rank = divmod(index, len(self.black_masks))
+        turn, white_rank = divmod(rest, len(self.white_masks))
+        return turn, self.white_masks[white_rank], self.black_masks[black_rank]
+
+def removable(pieces):
+    """Pieces a mill may take: those outside mills, or any piece if all are in mills."""
+    in_mills = 0
+    for mask in mill_masks:
+        if pieces & mask == mask:
+            in_mills |= mask
+    return pieces & ~in_mills or pieces
+
+def in_mill(pieces, position):
+    for mask in position_mill_masks[position]:
+        if pieces & mask == mask:
+            return True
+    return False
+
+def successors(turn, white, black):
+    """Yield (white, black, captured) after each move of the side to move.
+
+    captured is True when the move closed a mill and removed a piece.
+    """
+    own, other = (white, black) if turn == 0 else (black, white)
+    empty = board_mask & ~(white | black)
+    flying = own.bit_count() == 3
+    removals = None
+    for src in iter_bits(own):
+        targets = empty if flying else adjacency_masks[src] & empty
+        moved = own ^ (1 << src)
+        for dst in iter_bits(targets):
+            after = moved | (1 << dst)
+            if in_mill(after, dst):
+                if removals is None:
+                    removals = list(iter_bits(removable(other)))
+                for pos in removals:
+                    remaining = other ^ (1 << pos)
+                    yield (after, remaining, True) if turn == 0 else (remaining, after, True)
+            else:
+                yield (after, other, False) if turn == 0 else (other, after, False)
+
+def predecessors(turn, white, black):
+    """Yield (white, black) of positions whose mover reached this one without a capture.
+
+    The side that just moved is the one not to move now; the piece it moved
+    cannot stand in a mill, or the move would have captured.
+    """
+    mover = turn ^ 1
+    own = white if mover == 0 else black
+    empty = board_mask & ~(white | black)
+    flying = own.bit_count() == 3
+    for dst in iter_bits(own):
+        if in_mill(own, dst):
+            continue
+        sources = empty if flying else adjacency_masks[dst] & empty
+        moved = own ^ (1 << dst)
+        for src in iter_bits(sources):
+            before = moved | (1 << src)
+            yield (before, black) if mover == 0 else (white, before)
+
+class EndgameTablebase:
+    """Probes shard files through memory maps; shards are opened on first use."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.shards = {}
+        self.layouts = {}
+        self.hits = 0
+
+    def __getstate__(self):
+        return {'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'])
+
+    def shard(self, white_count, black_count):
+        """Return (layout, data) for a stored shard, or None if it has not been generated."""
+        key = (white_count, black_count)
+        if key not in self.shards:
+            filename = shard_filename(self.directory, white_count, black_count)
+            if not os.path.exists(filename):
+                self.shards[key] = None
+            else:
+                with open(filename, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, _, _, size = SHARD_HEADER.unpack_from(data, 0)
+                if magic != SHARD_MAGIC:
+                    data.close()
+                    raise ValueError(f"{filename} is not a tablebase shard.")
+                if key not in self.layouts:
+                    self.layouts[key] = ShardLayout(white_count, black_count)
+                self.shards[key] = (self.layouts[key], data)
+        return self.shards[key]
+
+    def value(self, turn, white, black):
+        """Stored byte for a position, or None when no shard covers it.
+
+        Only shards with at least as many white as black pieces are stored;
+        the others are read with the colours swapped.
+        """
+        white_count, black_count = white.bit_count(), black.bit_count()
+        if white_count < black_count:
+            turn, white, black = turn ^ 1, black, white
+            white_count, black_count = black_count, white_count
+        shard = self.shard(white_count, black_count)
+        if shard is None:
+            return None
+        layout, data = shard
+        return data[SHARD_HEADER.size + layout.index(turn, white, black)]
+
+    def probe(self, game):
+        """Return ('win' | 'loss' | 'draw', distance) for the side to move, or None."""
+        if game.phase < 2 or game.pieces_in_hand[0] or game.pieces_in_hand[1] or game.is_over():
+            return None
+        value = self.value(game.turn, game.pieces[0], game.pieces[1])
+        if value is None:
+            return None
+        self.hits += 1
+        return decode_value(value)
+
+    def close(self):
+        for shard in self.shards.values():
+            if shard is not None:
+                shard[1].close()
+        self.shards = {}
+
+# Per-process state for the initial pass and the propagation
+_worker_layout = None
+_worker_tablebase = None
+
+def _init_worker(directory, white_count, black_count):
+    global _worker_layout, _worker_tablebase
+    _worker_layout = ShardLayout(white_count, black_count)
+    _worker_tablebase = EndgameTablebase(directory)
+
+def _initial_pass(turn, start, stop):
+    """Classify the positions with white ranks in [start, stop) for one side to move.
+
+    Returns four byte strings over that slice: the value known before any
+    propagation (immediate wins and losses), the number of non-capturing
+    moves, the longest loss reachable through captures, and whether a
+    capture reaches a draw.
+    """
+    layout, tablebase = _worker_layout, _worker_tablebase
+    count = (stop - start) * len(layout.black_masks)
+    known = bytearray(count)
+    open_moves = bytearray(count)
+    capture_loss = bytearray(count)
+    capture_draw = bytearray(count)
+    slot = 0
+    for white in layout.white_masks[start:stop]:
+        for black in layout.black_masks:
+            if not white & black:
+                has_move = False
+                best_win = None
+                for child_white, child_black, captured in successors(turn, white, black):
+                    has_move = True
+                    if not captured:
+                        open_moves[slot] += 1
+                        continue
+                    if min(child_white.bit_count(), child_black.bit_count()) < 3:
+                        best_win = 1
+                        continue
+                    outcome, distance = decode_value(tablebase.value(turn ^ 1, child_white, child_black))
+                    if outcome == 'loss':
+                        if best_win is None or distance + 1 < best_win:
+                            best_win = distance + 1
+                    elif outcome == 'win':
+                        capture_loss[slot] = max(capture_loss[slot], min(distance + 1, MAX_DISTANCE))
+                    else:
+                        capture_draw[slot] = 1
+                if not has_move:
+                    known[slot] = loss_value(0)
+                elif best_win is not None:
+                    known[slot] = win_value(best_win)
+            slot += 1
+    return bytes(known), bytes(open_moves), bytes(capture_loss), bytes(capture_draw)
+
+def _parent_indices(indices):
+    """For each position index, the indices of the positions that reach it without a capture."""
+    layout = _worker_layout
+    parents = []
+    for index in indices:
+        turn, white, black = layout.position(index)
+        parents.append([layout.index(turn ^ 1, parent_white, parent_black)
+                        for parent_white, parent_black in predecessors(turn, white, black)])
+    return parents
+
+def generate_shard(directory, white_count, black_count, executor=None):
+    """Solve one shard by retrograde analysis and write it to disk.
+
+    Smaller shards reached by captures must already be in directory.
+    With an executor, the initial pass and the predecessor generation of
+    each propagation level run in its processes; the bookkeeping between
+    levels stays in this one. Returns the number of won, lost and drawn
+    real positions.
+    """
+    layout = ShardLayout(white_count, black_count)
+    tasks = [(turn, start, min(start + CHUNK_SIZE, len(layout.white_masks)))
+             for turn in (0, 1) for start in range(0, len(layout.white_masks), CHUNK_SIZE)]
+    known = bytearray(layout.size)
+    open_moves = bytearray(layout.size)
+    longest_loss = bytearray(layout.size)
+    can_draw = bytearray(layout.size)
+    if executor is None:
+        _init_worker(directory, white_count, black_count)
+        results = (_initial_pass(*task) for task in tasks)
+    else:
+        results = executor.map(_initial_pass, *zip(*tasks))
+    for (turn, start, stop), (slice_known, slice_open, slice_loss, slice_draw) in zip(tasks, results):
+        offset = (turn * len(layout.white_masks) + start) * len(layout.black_masks)
+        end = offset + len(slice_known)
+        known[offset:end] = slice_known
+        open_moves[offset:end] = slice_open
+        longest_loss[offset:end] = slice_loss
+        can_draw[offset:end] = slice_draw
+
+    # Resolve positions in order of distance, so every win is the fastest one
+    values = bytearray(layout.size)
+    levels = {}
+    for index, value in enumerate(known):
+        if value:
+            levels.setdefault(decode_value(value)[1], []).append((index, value))
+        elif open_moves[index] == 0 and longest_loss[index] and not can_draw[index]:
+            # Every move captures into a lost position
+            levels.setdefault(longest_loss[index], []).append((index, loss_value(longest_loss[index])))
+    distance = 0
+    while levels:
+        # Resolving a position only queues others at later distances, so a whole
+        # level is resolved first and its parents are generated in one batch
+        frontier = []
+        for index, value in levels.pop(distance, []):
+            if not values[index]:
+                values[index] = value
+                frontier.append((index, value))
+        chunks = [frontier[start:start + FRONTIER_CHUNK_SIZE]
+                  for start in range(0, len(frontier), FRONTIER_CHUNK_SIZE)]
+        indices = [[index for index, _ in chunk] for chunk in chunks]
+        parent_lists = map(_parent_indices, indices) if executor is None else executor.map(_parent_indices, indices)
+        resolved = ((value, parents) for chunk, chunk_parents in zip(chunks, parent_lists)
+                    for (_, value), parents in zip(chunk, chunk_parents))
+        for value, parents in resolved:
+            for parent in parents:
+                if values[parent]:
+                    continue
+                if value >= LOSS:
+                    levels.setdefault(distance + 1, []).append((parent, win_value(distance + 1)))
+                else:
+                    open_moves[parent] -= 1
+                    longest_loss[parent] = max(longest_loss[parent], min(distance + 1, MAX_DISTANCE))
+                    if open_moves[parent] == 0 and not known[parent] and not can_draw[parent]:
+                        levels.setdefault(longest_loss[parent], []).append(
+                            (parent, loss_value(longest_loss[parent])))
+        distance += 1
+
+    filename = shard_filename(directory, white_count, black_count)
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(SHARD_HEADER.pack(SHARD_MAGIC, white_count, black_count, layout.size))
+        f.write(values)
+    os.replace(filename + '.tmp', filename)
+    wins = sum(1 for value in values if 0 < value < LOSS)
+    losses = sum(1 for value in values if value >= LOSS)
+    real_positions = sum(1 for white in layout.white_masks for black in layout.black_masks if not white & black)
+    return wins, losses, 2 * real_positions - wins - losses
+
+def shard_order(max_pieces):
+    """Stored shards (white count >= black count), smallest total first."""
+    shards = [(white, black) for white in range(3, max_pieces + 1) for black in range(3, white + 1)]
+    return sorted(shards, key=lambda shard: (shard[0] + shard[1], shard))
+
+def generate(directory, max_pieces=3, workers=1, progress=print):
+    """Generate every shard with up to max_pieces pieces per side."""
+    os.makedirs(directory, exist_ok=True)
+    for white_count, black_count in shard_order(max_pieces):
+        start = time.perf_counter()
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(directory, white_count, black_count)) as executor:
+                counts = generate_shard(directory, white_count, black_count, executor)
+        else:
+            counts = generate_shard(directory, white_count, black_count)
+        if progress is not None:
+            progress(f"{white_count}v{black_count}: {counts[0]} wins, {counts[1]} losses, {counts[2]} draws "
+                     f"in {time.perf_counter() - start:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate moving/flying phase endgame tablebases.")
+    parser.add_argument('directory', help="where to write the shard files")
+    parser.add_argument('--max-pieces', type=int, default=3, help="largest piece count per side")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args()
+    generate(args.directory, args.max_pieces, args.workers)
+
+if __name__ == '__main__':
+    main()
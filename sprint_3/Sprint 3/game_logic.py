@@ -1,41 +1,164 @@
 import json
-from utils import check_mill, is_adjacent, count_pieces, adjacency_list
+from utils import (
+    BLOCKED_WEIGHT, PIECE_WEIGHT, adjacency_masks, bit_positions, blocked_difference, board_mask, bitboards_to_board,
+    board_to_bitboards, line_term_deltas, line_terms, mill_completions, mill_masks, mill_partner_masks, move_bytes,
+    move_tuples, neighbours, place_move_bytes, position_hash, position_line_masks, position_masks,
+    position_mill_masks, zobrist_flying, zobrist_hand, zobrist_pieces, zobrist_side
+)
+
+PLAYERS = ('W', 'B')
 
 class Game:
     def __init__(self, ai_player=None, record_game=False):
-        self.board = [' '] * 24
-        self.current_player = 'W'
+        # Bitboards and counters are indexed by player: 0 = W, 1 = B
+        self.pieces = [0, 0]
+        self.pieces_in_hand = [9, 9]
+        self.pieces_on_board = [0, 0]
+        self.turn = 0
         self.ai_player = ai_player
         self.phase = 1  # Game phases: 1 = placing pieces, 2 = moving pieces
         self.white_phase = 1  # Individual phases for flying
         self.black_phase = 1
         self.move_history = []
-        self.white_pieces_in_hand = 9
-        self.black_pieces_in_hand = 9
-        self.white_pieces_on_board = 0
-        self.black_pieces_on_board = 0
         self.record_game = record_game
         self.winner = None
+        self.undo_stack = []
+        # White's mill and open-two evaluation terms, kept up to date by toggle_piece
+        self.line_score = 0
+        self.compute_zobrist()
+
+    @property
+    def zobrist_hash(self):
+        """64-bit Zobrist hash of the position, kept up to date by every move."""
+        return self._zobrist
+
+    def compute_zobrist(self):
+        """Hash the position from scratch, e.g. after assigning state directly."""
+        self._zobrist = position_hash(self.pieces[0], self.pieces[1], self.turn, self.pieces_in_hand,
+                                      (self.white_phase == 3, self.black_phase == 3))
+        return self._zobrist
+
+    @property
+    def board(self):
+        """The board as a 24-character list. Assign a new list to change it."""
+        return bitboards_to_board(self.pieces[0], self.pieces[1])
+
+    @board.setter
+    def board(self, board):
+        self.pieces = list(board_to_bitboards(board))
+        self.line_score = line_terms(self.pieces[0], self.pieces[1])
+        self.compute_zobrist()
+
+    @property
+    def current_player(self):
+        return PLAYERS[self.turn]
+
+    @current_player.setter
+    def current_player(self, player):
+        if PLAYERS.index(player) != self.turn:
+            self.switch_player()
+
+    @property
+    def white_pieces_in_hand(self):
+        return self.pieces_in_hand[0]
+
+    @white_pieces_in_hand.setter
+    def white_pieces_in_hand(self, count):
+        self._zobrist ^= zobrist_hand[0][self.pieces_in_hand[0]] ^ zobrist_hand[0][count]
+        self.pieces_in_hand[0] = count
+
+    @property
+    def black_pieces_in_hand(self):
+        return self.pieces_in_hand[1]
+
+    @black_pieces_in_hand.setter
+    def black_pieces_in_hand(self, count):
+        self._zobrist ^= zobrist_hand[1][self.pieces_in_hand[1]] ^ zobrist_hand[1][count]
+        self.pieces_in_hand[1] = count
+
+    @property
+    def white_pieces_on_board(self):
+        return self.pieces_on_board[0]
+
+    @white_pieces_on_board.setter
+    def white_pieces_on_board(self, count):
+        self.pieces_on_board[0] = count
+
+    @property
+    def black_pieces_on_board(self):
+        return self.pieces_on_board[1]
+
+    @black_pieces_on_board.setter
+    def black_pieces_on_board(self, count):
+        self.pieces_on_board[1] = count
+
+    def empty_squares(self):
+        """Bitboard of the empty positions."""
+        return board_mask & ~(self.pieces[0] | self.pieces[1])
+
+    def forms_mill(self, player_index, position):
+        """Check whether the piece of player_index at position completes a mill."""
+        own = self.pieces[player_index]
+        for mask in position_mill_masks[position]:
+            if own & mask == mask:
+                return True
+        return False
+
+    def closes_mill(self, player_index, move):
+        """Check whether a place or move for player_index would complete a mill."""
+        own = self.pieces[player_index]
+        if move[0] == 'place':
+            to_pos = move[1]
+        else:
+            to_pos = move[2]
+            own ^= position_masks[move[1]]
+        own |= position_masks[to_pos]
+        for mask in position_mill_masks[to_pos]:
+            if own & mask == mask:
+                return True
+        return False
+
+    def blocks_mill(self, player_index, move):
+        """Check whether a place or move fills the open square of an opponent's two-in-a-row."""
+        to_pos = move[1] if move[0] == 'place' else move[2]
+        opponent = self.pieces[player_index ^ 1]
+        for mask in position_mill_masks[to_pos]:
+            if (opponent & mask).bit_count() == 2:
+                return True
+        return False
+
+    def toggle_piece(self, player_index, position):
+        """Add or take away a piece, updating the hash and the line score."""
+        pieces = self.pieces
+        mask = position_line_masks[position]
+        # Only the two mills through the position change
+        self.line_score += line_term_deltas[player_index][position][pieces[0] & mask | (pieces[1] & mask) << 24]
+        pieces[player_index] ^= position_masks[position]
+        self._zobrist ^= zobrist_pieces[player_index][position]
 
     def switch_player(self):
         """Switch to the other player."""
-        self.current_player = 'B' if self.current_player == 'W' else 'W'
+        self.turn ^= 1
+        self._zobrist ^= zobrist_side
 
     def place_piece(self, position):
         """Place a piece on the board during phase 1."""
-        if self.board[position] != ' ':
+        bit = position_masks[position]
+        if (self.pieces[0] | self.pieces[1]) & bit:
             return False, "Position already occupied."
-        self.board[position] = self.current_player
-        if self.current_player == 'W':
-            self.white_pieces_in_hand -= 1
-            self.white_pieces_on_board += 1
-        else:
-            self.black_pieces_in_hand -= 1
-            self.black_pieces_on_board += 1
+        turn = self.turn
+        if self.pieces_in_hand[turn] == 0:
+            return False, "No pieces left to place."
+        self.toggle_piece(turn, position)
+        hand = self.pieces_in_hand[turn]
+        self._zobrist ^= zobrist_hand[turn][hand] ^ zobrist_hand[turn][hand - 1]
+        self.pieces_in_hand[turn] -= 1
+        self.pieces_on_board[turn] += 1
         if self.record_game:
             self.move_history.append(('place', position, self.current_player))
 
-        formed_mill = check_mill(self.board, position)
+        # A mill only grants a removal while the opponent has a piece to remove
+        formed_mill = self.forms_mill(turn, position) and self.pieces[turn ^ 1]
         self.update_phase()
         if formed_mill:
             # Do not switch player; allow current player to remove an opponent's piece
@@ -46,39 +169,55 @@ class Game:
 
     def remove_piece(self, position):
         """Remove an opponent's piece when a mill is formed."""
-        opponent = 'B' if self.current_player == 'W' else 'W'
-        if self.board[position] != opponent:
+        opponent_index = self.turn ^ 1
+        bit = position_masks[position]
+        if not self.pieces[opponent_index] & bit:
             return False, "You can only remove an opponent's piece."
-        self.board[position] = ' '
-        if opponent == 'W':
-            self.white_pieces_on_board -= 1
-        else:
-            self.black_pieces_on_board -= 1
+        if not self.removable_pieces(opponent_index) & bit:
+            return False, "Pieces in a mill cannot be removed while other pieces are available."
+        self.toggle_piece(opponent_index, position)
+        self.pieces_on_board[opponent_index] -= 1
         if self.record_game:
-            self.move_history.append(('remove', position, opponent))
+            self.move_history.append(('remove', position, PLAYERS[opponent_index]))
 
         self.update_phase()
+        # The opponent moves next, so check the win condition from their side
+        self.switch_player()
         if self.check_win_condition():
             return True, "Game over."
         else:
-            self.switch_player()
             return True, "Piece removed."
 
+    def removable_pieces(self, player_index):
+        """Bitboard of the pieces of player_index that a mill may remove.
+
+        Pieces standing in a mill are protected unless every piece is in one.
+        """
+        pieces = self.pieces[player_index]
+        in_mills = 0
+        for mask in mill_masks:
+            if pieces & mask == mask:
+                in_mills |= mask
+        return pieces & ~in_mills or pieces
+
     def move_piece(self, from_pos, to_pos):
         """Move a piece during phase 2 or 3."""
-        if self.board[from_pos] != self.current_player:
+        turn = self.turn
+        from_bit = position_masks[from_pos]
+        to_bit = position_masks[to_pos]
+        if not self.pieces[turn] & from_bit:
             return False, "You can only move your own pieces."
-        if self.board[to_pos] != ' ':
+        if (self.pieces[0] | self.pieces[1]) & to_bit:
             return False, "Destination position is occupied."
-        player_phase = self.white_phase if self.current_player == 'W' else self.black_phase
-        if player_phase == 2 and not is_adjacent(from_pos, to_pos):
+        player_phase = self.black_phase if turn else self.white_phase
+        if player_phase == 2 and not adjacency_masks[from_pos] & to_bit:
             return False, "You can only move to adjacent positions."
-        self.board[from_pos] = ' '
-        self.board[to_pos] = self.current_player
+        self.toggle_piece(turn, from_pos)
+        self.toggle_piece(turn, to_pos)
         if self.record_game:
             self.move_history.append(('move', from_pos, to_pos, self.current_player))
 
-        formed_mill = check_mill(self.board, to_pos)
+        formed_mill = self.forms_mill(turn, to_pos) and self.pieces[turn ^ 1]
         if formed_mill:
             # Do not switch player; allow current player to remove an opponent's piece
             return True, "Mill formed. Remove an opponent's piece."
@@ -88,70 +227,145 @@ class Game:
 
     def update_phase(self):
         """Update the game phase based on the state of the game."""
-        if self.white_pieces_in_hand == 0 and self.black_pieces_in_hand == 0:
+        flying = (self.white_phase == 3, self.black_phase == 3)
+        if self.pieces_in_hand[0] == 0 and self.pieces_in_hand[1] == 0:
             self.phase = 2
         # Update individual player phases
-        if self.white_pieces_on_board == 3 and self.phase >= 2:
+        if self.pieces_on_board[0] == 3 and self.phase >= 2:
             self.white_phase = 3
         else:
             self.white_phase = 2
-        if self.black_pieces_on_board == 3 and self.phase >= 2:
+        if self.pieces_on_board[1] == 3 and self.phase >= 2:
             self.black_phase = 3
         else:
             self.black_phase = 2
+        if flying[0] != (self.white_phase == 3):
+            self._zobrist ^= zobrist_flying[0]
+        if flying[1] != (self.black_phase == 3):
+            self._zobrist ^= zobrist_flying[1]
 
     def check_win_condition(self):
         """Check if a player has won the game."""
-        if self.black_pieces_on_board < 3 and self.phase >= 2:
+        if self.pieces_on_board[1] < 3 and self.phase >= 2:
             self.winner = 'W'
             return True
-        if self.white_pieces_on_board < 3 and self.phase >= 2:
+        if self.pieces_on_board[0] < 3 and self.phase >= 2:
             self.winner = 'B'
             return True
         # Check if a player cannot move
         if self.phase >= 2:
-            if not self.get_possible_moves(self.current_player):
-                self.winner = 'B' if self.current_player == 'W' else 'W'
+            if not self.has_moves(self.turn):
+                self.winner = PLAYERS[self.turn ^ 1]
                 return True
         return False
 
+    def has_moves(self, player_index):
+        """Check whether the player has at least one legal move."""
+        empty = self.empty_squares()
+        if not empty:
+            return False
+        if self.phase == 1:
+            return self.pieces_in_hand[player_index] > 0
+        player_phase = self.black_phase if player_index else self.white_phase
+        if player_phase == 3:
+            return self.pieces[player_index] != 0
+        return bool(self.pieces[player_index] & neighbours(empty))
+
     def get_possible_moves(self, player):
-        """Get all possible moves for the specified player."""
+        """Get all possible moves for the specified player.
+
+        A move that closes a mill is listed once per piece it may remove, as a
+        compound move such as ('place', 2, 'remove', 5) or
+        ('move', 1, 2, 'remove', 5). Such moves follow the plain ones.
+        """
+        player_index = PLAYERS.index(player)
+        own = self.pieces[player_index]
+        empty = self.empty_squares()
+        # Only destinations next to two own pieces in a line can close a mill
+        closing = mill_completions(own, empty) if self.pieces[player_index ^ 1] else 0
         moves = []
+        removals = None
         if self.phase == 1:
-            pieces_in_hand = self.white_pieces_in_hand if player == 'W' else self.black_pieces_in_hand
-            if pieces_in_hand > 0:
-                for i in range(24):
-                    if self.board[i] == ' ':
-                        moves.append(('place', i))
+            if self.pieces_in_hand[player_index] > 0:
+                quiet = empty & ~closing
+                moves = list(place_move_bytes[0][quiet & 255] + place_move_bytes[1][quiet >> 8 & 255] +
+                             place_move_bytes[2][quiet >> 16])
+                if closing:
+                    removals = bit_positions(self.removable_pieces(player_index ^ 1))
+                    for i in bit_positions(closing):
+                        moves += [('place', i, 'remove', r) for r in removals]
         if self.phase >= 2:
-            player_phase = self.white_phase if player == 'W' else self.black_phase
-            for i in range(24):
-                if self.board[i] == player:
-                    if player_phase == 3:
-                        # Flying
-                        for j in range(24):
-                            if self.board[j] == ' ':
-                                moves.append(('move', i, j))
-                    else:
-                        # Move to adjacent positions
-                        for adj in adjacency_list[i]:
-                            if self.board[adj] == ' ':
-                                moves.append(('move', i, adj))
+            player_phase = self.black_phase if player_index else self.white_phase
+            flying = player_phase == 3
+            for i in bit_positions(own if flying else own & neighbours(empty)):
+                # Flying pieces reach every empty position, the others only adjacent ones
+                targets = empty if flying else adjacency_masks[i] & empty
+                quiet = targets & ~closing
+                table = move_bytes[i]
+                moves += table[0][quiet & 255] + table[1][quiet >> 8 & 255] + table[2][quiet >> 16]
+                if targets & closing:
+                    # The moving piece may itself be one of the two in the line
+                    moved = own ^ position_masks[i]
+                    for j in bit_positions(targets & closing):
+                        first, second = mill_partner_masks[j]
+                        if moved & first == first or moved & second == second:
+                            if removals is None:
+                                removals = bit_positions(self.removable_pieces(player_index ^ 1))
+                            moves += [('move', i, j, 'remove', r) for r in removals]
+                        else:
+                            moves.append(move_tuples[i][j])
         return moves
 
+    def evaluate(self, player):
+        """Heuristic evaluation of the position for the specified player."""
+        on_board = self.pieces_on_board
+        # Same score as utils.evaluate_board; blocked pieces are cheaper to count afresh than to track
+        score = (PIECE_WEIGHT * (on_board[0] - on_board[1]) + self.line_score
+                 - BLOCKED_WEIGHT * blocked_difference(self.pieces[0], self.pieces[1]))
+        return score if player == 'W' else -score
+
     def is_over(self):
         """Check if the game is over."""
         return self.winner is not None
 
     def make_move(self, move):
-        """Execute a move."""
+        """Execute a move, remembering how to take it back with unmake_move.
+
+        Compound moves end in ('remove', position) and remove that piece
+        after the place or move has closed a mill.
+        """
+        self.undo_stack.append(self.undo_record())
         if move[0] == 'place':
             self.place_piece(move[1])
+            removal = move[2:]
         elif move[0] == 'move':
             self.move_piece(move[1], move[2])
+            removal = move[3:]
         elif move[0] == 'remove':
-            self.remove_piece(move[1])
+            removal = move
+        if removal and removal[0] == 'remove':
+            self.remove_piece(removal[1])
+
+    def unmake_move(self):
+        """Take back the most recent make_move."""
+        self.restore(self.undo_stack.pop())
+
+    def undo_record(self):
+        """Capture the mutable game state as a compact tuple."""
+        hand, on_board = self.pieces_in_hand, self.pieces_on_board
+        counters = hand[0] | hand[1] << 4 | on_board[0] << 8 | on_board[1] << 12
+        return (self.pieces[0], self.pieces[1], counters, self.turn, self.phase,
+                self.white_phase, self.black_phase, self.winner, len(self.move_history), self._zobrist,
+                self.line_score)
+
+    def restore(self, record):
+        """Restore the state captured by undo_record."""
+        white, black, counters, self.turn, self.phase, self.white_phase, self.black_phase, \
+            self.winner, history_length, self._zobrist, self.line_score = record
+        self.pieces = [white, black]
+        self.pieces_in_hand = [counters & 15, counters >> 4 & 15]
+        self.pieces_on_board = [counters >> 8 & 15, counters >> 12 & 15]
+        del self.move_history[history_length:]
 
     def to_dict(self):
         """Convert the game state to a dictionary."""
@@ -182,6 +396,8 @@ class Game:
         self.black_pieces_on_board = data['black_pieces_on_board']
         self.winner = data['winner']
         self.move_history = data.get('move_history', [])
+        self.undo_stack = []
+        self.compute_zobrist()
 
     def save_game(self, filename):
         """Save the current game state to a file."""
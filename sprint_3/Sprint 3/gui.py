@@ -3,13 +3,24 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 from game_logic import Game
 from ai import AIPlayer
-from utils import adjacency_list, check_mill
+from ai_worker import AIWorker
+from ponder import Ponderer
+from utils import adjacency_list
 import copy
 
+# How often to check for the background AI's move
+AI_POLL_MS = 50
+
 class GameGUI:
     def __init__(self, game, root):
         self.game = game
         self.root = root
+        # Searches the AI's answers while the human thinks
+        self.ponderer = Ponderer(game.ai_player) if game.ai_player else None
+        # Searches off the Tk thread so the window stays responsive
+        self.ai_worker = AIWorker(game.ai_player) if game.ai_player else None
+        self.ai_after_id = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         self.create_menu()
         self.canvas_size = 600
         self.canvas = tk.Canvas(self.root, width=self.canvas_size, height=self.canvas_size, bg='orange')
@@ -53,7 +64,7 @@ class GameGUI:
         menu_bar.add_cascade(label='Game', menu=game_menu)
         game_menu.add_command(label='Load Game', command=self.load_game)
         game_menu.add_separator()
-        game_menu.add_command(label='Exit', command=self.root.quit)
+        game_menu.add_command(label='Exit', command=self.close)
 
     def calculate_positions(self):
         size = self.canvas_size
@@ -120,8 +131,9 @@ class GameGUI:
             self.board_items[pos] = item
 
     def update_board(self):
+        board = self.game.board
         for pos in range(24):
-            piece = self.game.board[pos]
+            piece = board[pos]
             item = self.board_items[pos]
             if piece == 'W':
                 self.canvas.itemconfig(item, fill='white')
@@ -154,6 +166,7 @@ class GameGUI:
             self.handle_phase_two(clicked_pos)
 
     def end_game(self):
+        self.cancel_ai()
         messagebox.showinfo("Game Over", f"Player {self.game.winner} wins!")
         self.canvas.unbind("<Button-1>")
         self.root.destroy()
@@ -242,40 +255,65 @@ class GameGUI:
     def ai_move(self):
         if self.game.ai_player and self.game.current_player == 'B':
             self.status_label['text'] = "AI is thinking..."
-            self.root.after(1000, self.perform_ai_move)
+            # Let the human's move be drawn before searching
+            self.ai_after_id = self.root.after_idle(self.perform_ai_move)
 
     def perform_ai_move(self):
-        move = self.game.ai_player.get_move(self.game)
+        self.ai_after_id = None
+        if self.ponderer and self.ponderer.request_stop(keep=self.game.zobrist_hash):
+            # The reply to this very move is still being pondered; wait for it
+            self.ai_after_id = self.root.after(AI_POLL_MS, self.perform_ai_move)
+            return
+        move = self.ponderer.take(self.game) if self.ponderer else None
+        if move is not None:
+            self.finish_ai_move(move)
+            return
+        self.ai_worker.start(self.game)
+        self.ai_after_id = self.root.after(AI_POLL_MS, self.poll_ai_move)
+
+    def poll_ai_move(self):
+        self.ai_after_id = None
+        done, move = self.ai_worker.poll()
+        if not done:
+            self.ai_after_id = self.root.after(AI_POLL_MS, self.poll_ai_move)
+            return
+        self.finish_ai_move(move)
+
+    def finish_ai_move(self, move):
         if move is None:
             self.game.winner = 'W'
             self.check_game_over()
             return
-        if move[0] == 'place':
-            self.game.place_piece(move[1])
-            move_pos = move[1]
-        elif move[0] == 'move':
-            self.game.move_piece(move[1], move[2])
-            move_pos = move[2]
-        self.update_board()
-        if self.game.check_win_condition():
-            self.end_game()
-            return
-        if check_mill(self.game.board, move_pos):
-            self.perform_ai_remove_piece()
-        else:
-            self.update_board()
-
-    def perform_ai_remove_piece(self):
-        opponent = 'W'
-        for pos in range(24):
-            if self.game.board[pos] == opponent:
-                self.game.remove_piece(pos)
-                break
+        # Moves that close a mill already name the piece to remove
+        self.game.make_move(move)
+        # The GUI never takes moves back, so don't let undo records pile up
+        self.game.undo_stack.clear()
         self.update_board()
         if self.game.check_win_condition():
             self.end_game()
         else:
-            self.update_board()
+            self.start_pondering()
+
+    def start_pondering(self):
+        if self.ponderer and self.game.current_player == 'W' and not self.game.is_over():
+            self.ponderer.start(self.game)
+
+    def stop_pondering(self):
+        if self.ponderer:
+            self.ponderer.stop()
+
+    def cancel_ai(self):
+        """Call off the AI's search and pondering, dropping any move they would have made."""
+        if self.ai_after_id is not None:
+            self.root.after_cancel(self.ai_after_id)
+            self.ai_after_id = None
+        if self.ai_worker:
+            self.ai_worker.stop()
+        self.stop_pondering()
+
+    def close(self):
+        self.cancel_ai()
+        self.root.destroy()
 
     def check_game_over(self):
         if self.game.check_win_condition():
@@ -298,12 +336,16 @@ class GameGUI:
             title='Load Game'
         )
         if filename:
+            self.cancel_ai()
             self.game.load_game(filename)
             self.update_board()
             messagebox.showinfo("Load Game", "Game loaded successfully.")
+            self.ai_move()
+            self.start_pondering()
 
     def start(self):
         self.update_board()
+        self.start_pondering()
         self.root.mainloop()
 
     def start_recording(self):
@@ -313,6 +355,13 @@ class GameGUI:
         self.game.record_game = True
         messagebox.showinfo("Recording", "Game recording started.")
 
+    def save_replay_state(self):
+        """Keep the game to resume after replaying; the AI player is shared, not copied."""
+        # The AI's search and pondering update its tables from other threads;
+        # resume_game starts them again
+        self.cancel_ai()
+        self.saved_game_state = copy.deepcopy(self.game, {id(self.game.ai_player): self.game.ai_player})
+
     def rewind(self):
         if self.is_playing:
             self.is_playing = False
@@ -323,7 +372,7 @@ class GameGUI:
             messagebox.showinfo("Rewind", "No moves to rewind.")
             return
         if not self.is_replaying:
-            self.saved_game_state = copy.deepcopy(self.game)
+            self.save_replay_state()
         self.is_replaying = True
         self.replay_index = 0
         self.replay_game_state()
@@ -338,7 +387,7 @@ class GameGUI:
             messagebox.showinfo("Back", "No previous moves.")
             return
         if not self.is_replaying:
-            self.saved_game_state = copy.deepcopy(self.game)
+            self.save_replay_state()
             self.replay_index = len(self.game.move_history)
         self.is_replaying = True
         self.replay_index -= 1
@@ -349,7 +398,7 @@ class GameGUI:
             messagebox.showinfo("Play/Pause", "No moves to play.")
             return
         if not self.is_replaying:
-            self.saved_game_state = copy.deepcopy(self.game)
+            self.save_replay_state()
             self.replay_index = 0
             self.is_replaying = True
         self.is_playing = not self.is_playing
@@ -370,7 +419,7 @@ class GameGUI:
             messagebox.showinfo("Next", "No next moves.")
             return
         if not self.is_replaying:
-            self.saved_game_state = copy.deepcopy(self.game)
+            self.save_replay_state()
             self.replay_index = 0
         self.is_replaying = True
         self.replay_index += 1
@@ -386,7 +435,7 @@ class GameGUI:
             messagebox.showinfo("Forward", "No moves to fast forward.")
             return
         if not self.is_replaying:
-            self.saved_game_state = copy.deepcopy(self.game)
+            self.save_replay_state()
         self.is_replaying = True
         self.replay_index = len(self.game.move_history)
         self.replay_game_state()
@@ -398,6 +447,7 @@ class GameGUI:
                 self.root.after_cancel(self.playback_after_id)
                 self.playback_after_id = None
         if self.saved_game_state is not None:
+            self.cancel_ai()
             self.game = self.saved_game_state
             self.saved_game_state = None
             self.is_replaying = False
@@ -406,6 +456,8 @@ class GameGUI:
             self.update_board()
             self.canvas.bind("<Button-1>", self.handle_click)
             self.status_label['text'] = f"Player {self.game.current_player}'s turn. Phase {self.game.phase}."
+            self.ai_move()
+            self.start_pondering()
         else:
             messagebox.showinfo("Resume", "Not in replay mode.")
 
@@ -427,6 +479,7 @@ class GameGUI:
         self.game.white_pieces_on_board = replay_game.white_pieces_on_board
         self.game.black_pieces_on_board = replay_game.black_pieces_on_board
         self.game.winner = replay_game.winner
+        self.game.compute_zobrist()
         self.update_board()
         self.canvas.unbind("<Button-1>")
 
@@ -1,10 +1,23 @@
 #main.py
+import os
 from game_logic import Game
 from ai import AIPlayer
+from opening_book import OpeningBook
 from gui import GameGUI
 import tkinter as tk
 from tkinter import simpledialog, messagebox, filedialog
 
+# The AI deepens its search until the per-move time budget runs out
+AI_MAX_DEPTH = 8
+AI_TIME_LIMIT = 1.0  # seconds per move
+# Built with: python opening_book.py opening_book.bin
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+def create_ai_player():
+    """Create the AI opponent, using the opening book when one has been built."""
+    book = OpeningBook(BOOK_FILE) if os.path.exists(BOOK_FILE) else None
+    return AIPlayer(depth=AI_MAX_DEPTH, time_limit=AI_TIME_LIMIT, book=book)
+
 def main():
     root = tk.Tk()
     root.withdraw()  # Hide the main window
@@ -21,7 +34,7 @@ def main():
         gui.start()
     elif game_mode == '2':
         root = tk.Tk()
-        ai_player = AIPlayer(depth=3)
+        ai_player = create_ai_player()
         game = Game(ai_player=ai_player)
         game.current_player = 'W'  # Ensure the human starts first
         gui = GameGUI(game, root)
@@ -39,7 +52,7 @@ def main():
             # Check if the game involves an AI player
             ai_option = messagebox.askyesno("AI Player", "Is this a game against the AI?")
             if ai_option:
-                ai_player = AIPlayer(depth=3)
+                ai_player = create_ai_player()
                 game.ai_player = ai_player
             gui = GameGUI(game, root)
             gui.update_board()
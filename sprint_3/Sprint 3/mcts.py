@@ -0,0 +1,210 @@
+#mcts.py
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game_logic import Game, PLAYERS
+
+# UCT exploration constant
+EXPLORATION = 1.4
+
+# Rollouts longer than this many plies count as draws
+ROLLOUT_LIMIT = 200
+
+# 'random' plays uniformly random moves; 'mills' closes a mill whenever it can
+ROLLOUT_POLICIES = ('random', 'mills')
+
+class Node:
+    """A position in the search tree, reached by move; wins are counted for the player who made it."""
+    __slots__ = ('move', 'parent', 'player', 'key', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, game, move=None, parent=None, player=None):
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.key = game.zobrist_hash
+        self.children = []
+        self.untried = [] if game.is_over() else game.get_possible_moves(game.current_player)
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """The child with the best UCT score."""
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+class MCTSPlayer:
+    """Monte Carlo tree search with UCT selection and random rollouts.
+
+    Each move is searched for a number of playouts or until the time
+    limit, whichever comes first. The subtree of the position actually
+    reached is kept for the next move. With workers > 1 every process
+    grows its own tree from the root and the root visit counts are
+    summed (root parallelism); the trees are not reused in that mode.
+    """
+
+    def __init__(self, playouts=2000, time_limit=None, exploration=EXPLORATION, rollout_policy='mills',
+                 rollout_limit=ROLLOUT_LIMIT, reuse_tree=True, workers=1, seed=None):
+        if rollout_policy not in ROLLOUT_POLICIES:
+            raise ValueError(f"Unknown rollout policy {rollout_policy!r}.")
+        self.playouts = playouts  # Playouts per move, or None to use only the time limit
+        self.time_limit = time_limit  # Seconds per move, or None
+        self.exploration = exploration
+        self.rollout_policy = rollout_policy
+        self.rollout_limit = rollout_limit
+        self.reuse_tree = reuse_tree
+        self.workers = workers
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.root = None
+        self.executor = None
+        self.last_search = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['root'] = None
+        return state
+
+    def close(self):
+        """Shut down the worker processes of the root-parallel search."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def get_move(self, game):
+        """Get the most visited move after searching the current position."""
+        if not game.get_possible_moves(game.current_player):
+            return None
+        start = time.perf_counter()
+        if self.workers > 1:
+            visits = self.search_parallel(game)
+            self.last_search['time'] = time.perf_counter() - start
+            return max(visits, key=visits.get)
+        root = self.find_root(game)
+        reused = root.visits
+        record_game, game.record_game = game.record_game, False
+        try:
+            playouts = self.search(game, root, start)
+        finally:
+            game.record_game = record_game
+        best = max(root.children, key=lambda child: child.visits)
+        self.root = root if self.reuse_tree else None
+        self.last_search = {'playouts': playouts, 'reused_visits': reused, 'visits': best.visits,
+                            'win_rate': best.wins / best.visits, 'time': time.perf_counter() - start}
+        return best.move
+
+    def find_root(self, game):
+        """The kept node for the game's position, searching up to two plies below the last root."""
+        key = game.zobrist_hash
+        if self.root is not None:
+            frontier = [self.root]
+            for _ in range(3):
+                for node in frontier:
+                    if node.key == key:
+                        node.parent = None
+                        node.move = None
+                        return node
+                frontier = [child for node in frontier for child in node.children]
+        return Node(game)
+
+    def search(self, game, root, start):
+        """Run playouts from root until the budget is spent; return how many ran.
+
+        The first playout always runs, so the root has a child to pick
+        however small the budget.
+        """
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        playouts = 0
+        while True:
+            if playouts and self.playouts is not None and playouts >= self.playouts:
+                break
+            if playouts and deadline is not None and time.perf_counter() >= deadline:
+                break
+            self.playout(game, root)
+            playouts += 1
+        return playouts
+
+    def playout(self, game, root):
+        """Select, expand, roll out and back up once."""
+        node = root
+        depth = 0
+        while not node.untried and node.children:
+            node = node.select_child(self.exploration)
+            game.make_move(node.move)
+            depth += 1
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            player = game.current_player
+            game.make_move(move)
+            depth += 1
+            child = Node(game, move, node, player)
+            node.children.append(child)
+            node = child
+        winner = self.rollout(game)
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.player:
+                node.wins += 1
+            node = node.parent
+        for _ in range(depth):
+            game.unmake_move()
+
+    def rollout(self, game):
+        """Play the position out with the rollout policy; return the winner, or None for a draw."""
+        winner = None
+        plies = 0
+        mills_first = self.rollout_policy == 'mills'
+        while plies < self.rollout_limit:
+            if game.is_over():
+                winner = game.winner
+                break
+            moves = game.get_possible_moves(game.current_player)
+            if not moves:
+                # A player who cannot move loses
+                winner = PLAYERS[game.turn ^ 1]
+                break
+            if mills_first:
+                captures = [move for move in moves if move[-2] == 'remove']
+                if captures:
+                    moves = captures
+            game.make_move(moves[self.rng.randrange(len(moves))])
+            plies += 1
+        for _ in range(plies):
+            game.unmake_move()
+        return winner
+
+    def search_parallel(self, game):
+        """Grow one tree per worker from the game's position; return the summed root visit counts."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        state = game.to_dict()
+        state['move_history'] = []
+        playouts = None if self.playouts is None else max(1, self.playouts // self.workers)
+        config = {'playouts': playouts, 'time_limit': self.time_limit, 'exploration': self.exploration,
+                  'rollout_policy': self.rollout_policy, 'rollout_limit': self.rollout_limit, 'reuse_tree': False}
+        seeds = [self.rng.getrandbits(32) for _ in range(self.workers)]
+        futures = [self.executor.submit(_search_tree, config, state, seed) for seed in seeds]
+        visits = {}
+        total = 0
+        for future in futures:
+            counts, playouts = future.result()
+            total += playouts
+            for move, count in counts.items():
+                visits[move] = visits.get(move, 0) + count
+        self.last_search = {'playouts': total, 'reused_visits': 0, 'visits': max(visits.values()),
+                            'workers': self.workers}
+        return visits
+
+def _search_tree(config, state, seed):
+    """Worker side of the root-parallel search; return ({move: visits}, playouts)."""
+    player = MCTSPlayer(seed=seed, **config)
+    game = Game()
+    game.from_dict(state)
+    game.record_game = False
+    root = Node(game)
+    playouts = player.search(game, root, time.perf_counter())
+    return {child.move: child.visits for child in root.children}, playouts
@@ -0,0 +1,76 @@
+#move_ordering.py
+# Ordering scores, highest first; history scores stay below the killer moves
+TT_MOVE_SCORE = 1 << 30
+MILL_SCORE = 1 << 24
+BLOCK_SCORE = 1 << 22
+KILLER_SCORES = (1 << 21, (1 << 21) - 1)
+HISTORY_CAP = (1 << 21) - 2
+
+class MoveOrderer:
+    """Sorts moves so that alpha-beta tries the most promising ones first.
+
+    Moves that close a mill come first, then moves that block an opponent's
+    two-in-a-row, then the killer moves of the current ply and finally moves
+    ranked by the history heuristic. A move from the transposition table
+    always leads.
+    """
+
+    def __init__(self, max_ply=64):
+        self.max_ply = max_ply
+        self.killers = [[None, None] for _ in range(max_ply)]
+        self.history = {}
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Forget killers and age the history scores before a new root search."""
+        self.killers = [[None, None] for _ in range(self.max_ply)]
+        self.history = {move: score >> 1 for move, score in self.history.items() if score > 1}
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, game, moves, player_index, ply, tt_move=None):
+        """Return moves sorted best first for player_index at the given ply."""
+        killers = self.killers[ply] if ply < self.max_ply else (None, None)
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = TT_MOVE_SCORE
+            elif game.closes_mill(player_index, move):
+                score = MILL_SCORE
+            elif game.blocks_mill(player_index, move):
+                score = BLOCK_SCORE
+            elif move == killers[0]:
+                score = KILLER_SCORES[0]
+            elif move == killers[1]:
+                score = KILLER_SCORES[1]
+            else:
+                score = min(history.get(move, 0), HISTORY_CAP)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, move, ply, depth, move_number):
+        """Reward a move that caused a beta cutoff after move_number earlier tries."""
+        self.cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def stats(self):
+        """Cutoff counters since the last new_search."""
+        return {
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate,
+        }
@@ -0,0 +1,143 @@
+#opening_book.py
+import argparse
+import mmap
+import struct
+import time
+from ai import AIPlayer
+from game_logic import Game
+from utils import canonical_hash, inverse_symmetries, transform_move
+
+# File layout: header, then records sorted by key
+BOOK_MAGIC = b'NMMBOOK1'
+HEADER = struct.Struct('<8sI')  # magic, record count
+RECORD = struct.Struct('<QBBB')  # canonical key, from, to, remove
+NO_POSITION = 255  # 'from' of a placement or 'remove' of a move without a removal
+
+def encode_move(move):
+    """Pack a place or move (with optional removal) into (from, to, remove) bytes."""
+    if move[0] == 'place':
+        from_pos, to_pos, removal = NO_POSITION, move[1], move[2:]
+    else:
+        from_pos, to_pos, removal = move[1], move[2], move[3:]
+    return from_pos, to_pos, removal[1] if removal else NO_POSITION
+
+def decode_move(from_pos, to_pos, remove):
+    """Inverse of encode_move."""
+    move = ('place', to_pos) if from_pos == NO_POSITION else ('move', from_pos, to_pos)
+    if remove != NO_POSITION:
+        move += ('remove', remove)
+    return move
+
+def collect_positions(plies):
+    """Canonical positions reachable in fewer than plies moves, as {key: (transform, game state)}."""
+    positions = {}
+    game = Game()
+
+    def visit(ply):
+        key, transform = canonical_hash(game)
+        if key in positions or game.is_over():
+            return
+        positions[key] = (transform, game.to_dict())
+        if ply + 1 >= plies:
+            return
+        for move in game.get_possible_moves(game.current_player):
+            game.make_move(move)
+            visit(ply + 1)
+            game.unmake_move()
+
+    visit(0)
+    return positions
+
+def build_book(filename, plies=4, depth=5, tt_size_mb=64, progress=None):
+    """Search every position of the first plies moves and write the book file.
+
+    Symmetric positions are stored once, under their canonical key, with
+    the best move translated to the canonical board.
+    """
+    positions = collect_positions(plies)
+    ai = AIPlayer(depth=depth, tt_size_mb=tt_size_mb)
+    records = []
+    for count, (key, (transform, state)) in enumerate(sorted(positions.items()), 1):
+        game = Game()
+        game.from_dict(state)
+        move = ai.get_move(game)
+        if move is not None:
+            records.append(RECORD.pack(key, *encode_move(transform_move(move, transform))))
+        if progress is not None:
+            progress(count, len(positions))
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(BOOK_MAGIC, len(records)))
+        for record in records:
+            f.write(record)
+    return len(records)
+
+class OpeningBook:
+    """Read-only view of a book file; records are binary-searched in a memory map."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != BOOK_MAGIC:
+            self.data.close()
+            raise ValueError(f"{filename} is not an opening book.")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        # Worker processes reopen the file instead of copying the map
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def find(self, key):
+        """Return the (from, to, remove) record stored for key, or None."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = RECORD.unpack_from(self.data, HEADER.size + middle * RECORD.size)
+            if record[0] < key:
+                low = middle + 1
+            elif record[0] > key:
+                high = middle
+            else:
+                return record[1:]
+        return None
+
+    def lookup(self, game):
+        """Return the book move for the game's position, or None when it is not in the book."""
+        key, transform = canonical_hash(game)
+        record = self.find(key)
+        if record is not None:
+            move = transform_move(decode_move(*record), inverse_symmetries[transform])
+            if move in game.get_possible_moves(game.current_player):
+                self.hits += 1
+                return move
+        self.misses += 1
+        return None
+
+    def close(self):
+        self.data.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a placement-phase opening book.")
+    parser.add_argument('output', help="book file to write")
+    parser.add_argument('--plies', type=int, default=4, help="cover positions of the first N moves")
+    parser.add_argument('--depth', type=int, default=5, help="search depth for each position")
+    parser.add_argument('--tt-size-mb', type=int, default=64, help="transposition table size")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r{done}/{total} positions", end='', flush=True)
+
+    count = build_book(args.output, args.plies, args.depth, args.tt_size_mb, progress)
+    print(f"\nWrote {count} positions to {args.output} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#perft.py
+import argparse
+import time
+from game_logic import Game
+try:
+    import numpy as np
+    from batch_game import NO_REMOVAL, BatchGame
+except ImportError:
+    np = None
+
+# Stored positions: board as 24 characters of W, B or '.', and the player to move.
+# Positions other than the start have no pieces left in hand.
+PERFT_POSITIONS = {
+    'start': None,
+    'moving': ('WWB.W.BWWB.WBB..BW..B.W.', 'W'),
+    'moving-black': ('W.BWBW..BBWW.B.W..B..W.B', 'B'),
+    'flying': ('WB.B.W...BW..B...B.BB...', 'W'),
+    'flying-both': ('W.B..W...B....B....W....', 'B'),
+}
+
+# Positions expanded at once by the batch backend
+BATCH_CHUNK = 4096
+
+def load_position(name):
+    """A Game holding one of the stored perft positions."""
+    game = Game()
+    game.record_game = False
+    if PERFT_POSITIONS[name] is None:
+        return game
+    board, player = PERFT_POSITIONS[name]
+    game.board = [' ' if piece == '.' else piece for piece in board]
+    game.white_pieces_in_hand = game.black_pieces_in_hand = 0
+    game.white_pieces_on_board, game.black_pieces_on_board = board.count('W'), board.count('B')
+    game.update_phase()
+    game.current_player = player
+    game.compute_zobrist()
+    return game
+
+def perft(game, depth):
+    """Count the positions reached by every sequence of depth moves; finished games have no moves."""
+    if depth == 0:
+        return 1
+    if game.is_over():
+        return 0
+    moves = game.get_possible_moves(game.current_player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.make_move(move)
+        nodes += perft(game, depth - 1)
+        game.unmake_move()
+    return nodes
+
+def divide(game, depth):
+    """Perft split by root move, as {move: count}."""
+    counts = {}
+    if game.is_over():
+        return counts
+    for move in game.get_possible_moves(game.current_player):
+        game.make_move(move)
+        counts[move] = perft(game, depth - 1)
+        game.unmake_move()
+    return counts
+
+def batch_children(batch):
+    """Every move of every game in the batch as (rows, sources, destinations, removals) arrays."""
+    moves, closes, removable = batch.legal_moves()
+    rows, sources, destinations = np.nonzero(moves & ~closes)
+    capture_rows, capture_sources, capture_destinations = np.nonzero(closes)
+    captures, removals = np.nonzero(removable[capture_rows])
+    return (np.concatenate([rows, capture_rows[captures]]),
+            np.concatenate([sources, capture_sources[captures]]),
+            np.concatenate([destinations, capture_destinations[captures]]),
+            np.concatenate([np.full(len(rows), NO_REMOVAL), removals]))
+
+def batch_perft(batch, depth):
+    """perft summed over every game of a BatchGame."""
+    if depth == 0:
+        return batch.count
+    moves, closes, removable = batch.legal_moves()
+    if depth == 1:
+        quiet = int((moves & ~closes).sum())
+        return quiet + int((closes.sum(axis=(1, 2)) * removable.sum(axis=1)).sum())
+    rows, sources, destinations, removals = batch_children(batch)
+    nodes = 0
+    for start in range(0, len(rows), BATCH_CHUNK):
+        chunk = slice(start, start + BATCH_CHUNK)
+        children = batch.select(rows[chunk])
+        children.apply(sources[chunk], destinations[chunk], removals[chunk])
+        nodes += batch_perft(children, depth - 1)
+    return nodes
+
+def batch_divide(game, depth):
+    """divide on the batch backend, with moves in game_logic form."""
+    batch = BatchGame.from_games([game])
+    rows, sources, destinations, removals = batch_children(batch)
+    counts = {}
+    for source, destination, removal in zip(sources, destinations, removals):
+        child = batch.select([0])
+        child.apply([source], [destination], [removal])
+        counts[batch.move_tuple(source, destination, removal)] = batch_perft(child, depth - 1)
+    return counts
+
+BACKENDS = {'game': (perft, divide)}
+if np is not None:
+    BACKENDS['batch'] = (lambda game, depth: batch_perft(BatchGame.from_games([game]), depth), batch_divide)
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move-generator leaf nodes and time the generator.")
+    parser.add_argument('depth', type=int, help="plies to search")
+    parser.add_argument('--position', choices=sorted(PERFT_POSITIONS) + ['all'], default='all')
+    parser.add_argument('--backend', choices=sorted(BACKENDS) + ['all'], default='game')
+    parser.add_argument('--divide', action='store_true', help="print the count below every root move")
+    args = parser.parse_args()
+    positions = sorted(PERFT_POSITIONS) if args.position == 'all' else [args.position]
+    backends = sorted(BACKENDS) if args.backend == 'all' else [args.backend]
+    mismatches = 0
+    for name in positions:
+        totals = {}
+        for backend in backends:
+            count, split = BACKENDS[backend]
+            game = load_position(name)
+            start = time.perf_counter()
+            if args.divide:
+                counts = split(game, args.depth)
+                nodes = sum(counts.values())
+            else:
+                nodes = count(game, args.depth)
+            elapsed = time.perf_counter() - start
+            totals[backend] = nodes
+            rate = nodes / elapsed if elapsed > 0 else 0.0
+            print(f"{name:<14} {backend:<6} depth {args.depth}: {nodes} nodes in {elapsed:.3f}s ({rate:,.0f} nodes/s)")
+            if args.divide:
+                for move in sorted(counts, key=str):
+                    print(f"    {move}: {counts[move]}")
+        if len(set(totals.values())) > 1:
+            mismatches += 1
+            print(f"{name}: backends disagree: {totals}")
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
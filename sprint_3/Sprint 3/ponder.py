@@ -0,0 +1,96 @@
+#ponder.py
+import threading
+from ai import SearchAborted
+from game_logic import Game
+
+# How many of the human's likeliest moves to answer in advance
+PONDER_PREDICTIONS = 3
+# Depth of the search that ranks the human's moves
+PREDICTION_DEPTH = 2
+
+class Ponderer:
+    """Searches the AI's replies to the human's likeliest moves while the human is thinking.
+
+    The ponderer owns the AI player while it runs, so the replies found
+    and the transposition table they fill are shared with the searches
+    made after a miss. The table maps the position after a predicted
+    human move to the AI's reply.
+    """
+
+    def __init__(self, ai_player, predictions=PONDER_PREDICTIONS, prediction_depth=PREDICTION_DEPTH):
+        self.ai_player = ai_player
+        self.predictions = predictions
+        self.prediction_depth = prediction_depth
+        self.table = {}
+        self.predicted = []
+        self.searching = None  # Key of the position whose reply is being searched
+        self.stopping = False
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, game):
+        """Begin pondering on a copy of the game, where the human is to move."""
+        self.stop()
+        state = game.to_dict()
+        state['move_history'] = []
+        self.table = {}
+        self.predicted = []
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, args=(state,), daemon=True)
+        self.thread.start()
+
+    def run(self, state):
+        game = Game()
+        game.from_dict(state)
+        game.record_game = False
+        try:
+            ranked = self.ai_player.rank_moves(game, self.prediction_depth)
+        except SearchAborted:
+            return
+        self.predicted = [move for move, _ in ranked[:self.predictions]]
+        for move in self.predicted:
+            if self.stopping:
+                return
+            game.make_move(move)
+            if not game.is_over():
+                self.searching = game.zobrist_hash
+                reply = self.ai_player.get_move(game)
+                self.searching = None
+                if reply is not None and not self.ai_player.aborted:
+                    self.table[game.zobrist_hash] = reply
+            game.unmake_move()
+
+    def wait(self):
+        """Block until every predicted move has been answered or pondering stops."""
+        if self.thread is not None:
+            self.thread.join()
+
+    def request_stop(self, keep=None):
+        """Ask pondering to stop without waiting; return whether the thread is still running.
+
+        A search of the position keyed keep is allowed to finish.
+        """
+        if self.thread is None:
+            return False
+        self.stopping = True
+        if keep is None or self.searching != keep:
+            self.ai_player.abort()
+        return self.thread.is_alive()
+
+    def stop(self, keep=None):
+        """Stop pondering and wait for the thread; a search of the position keyed keep may finish."""
+        while self.request_stop(keep):
+            self.thread.join(0.01)
+        self.thread = None
+
+    def take(self, game):
+        """Stop pondering and return the reply found for the game's position, or None."""
+        key = game.zobrist_hash
+        self.stop(keep=key)
+        move = self.table.get(key)
+        if move is not None and move in game.get_possible_moves(game.current_player):
+            self.hits += 1
+            return move
+        self.misses += 1
+        return None
@@ -0,0 +1,33 @@
+#search_log.py
+import json
+import time
+
+class StatsLog:
+    """Appends the stats of every search to a JSON Lines file.
+
+    Pass an instance as AIPlayer(stats_hook=...); each line is the
+    player's last_search with a wall-clock timestamp added.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'a')
+
+    def __call__(self, stats):
+        self.file.write(json.dumps(dict(stats, timestamp=time.time())) + '\n')
+        self.file.flush()
+
+    def __getstate__(self):
+        # Copies of the player (worker processes, replay snapshots) reopen the file
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def close(self):
+        self.file.close()
+
+def read_stats(filename):
+    """Load every record of a stats log."""
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
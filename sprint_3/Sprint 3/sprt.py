@@ -0,0 +1,158 @@
+#sprt.py
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from arena import (
+    MAX_PLIES, OPENING_PLIES, engine_score, game_tasks, parse_engine, play_game, random_openings, summary
+)
+
+# Default hypotheses: H0 the change gains nothing, H1 it gains ELO1
+ELO0 = 0.0
+ELO1 = 5.0
+# False positive and false negative rates
+ALPHA = 0.05
+BETA = 0.05
+# Give up undecided after this many games
+MAX_GAMES = 20000
+# Results added to each of W, D and L when measuring the variance, so
+# one-sided records such as all wins or all draws still move the LLR
+VARIANCE_PSEUDO_COUNT = 0.5
+
+ACCEPT = 'H1'
+REJECT = 'H0'
+
+def expected_score(elo):
+    """Mean score of a player elo points stronger than its opponent."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def sprt_bounds(alpha=ALPHA, beta=BETA):
+    """Log-likelihood ratios at which H0 (lower) and H1 (upper) are accepted."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def log_likelihood_ratio(wins, draws, losses, elo0=ELO0, elo1=ELO1):
+    """Approximate LLR of H1 (elo1) against H0 (elo0) for a W/D/L record.
+
+    Uses the normal approximation of the generalised SPRT: the results are
+    treated as trinomial with the variance observed so far, regularised by
+    VARIANCE_PSEUDO_COUNT.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0
+    score = (wins + 0.5 * draws) / games
+    win, draw, loss = (count + VARIANCE_PSEUDO_COUNT for count in (wins, draws, losses))
+    mean = (win + 0.5 * draw) / (win + draw + loss)
+    variance = (win * (1 - mean) ** 2 + draw * (0.5 - mean) ** 2 + loss * mean ** 2) / (win + draw + loss)
+    score0, score1 = expected_score(elo0), expected_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+def sprt_decision(llr, bounds):
+    """ACCEPT, REJECT or None while the test goes on."""
+    lower, upper = bounds
+    if llr >= upper:
+        return ACCEPT
+    if llr <= lower:
+        return REJECT
+    return None
+
+def run_sprt(engine, opponent, workers, openings, elo0=ELO0, elo1=ELO1, alpha=ALPHA, beta=BETA,
+             max_games=MAX_GAMES, time_limit=None, max_plies=MAX_PLIES, output=None, progress=None):
+    """Play colour-swapped pairs until the SPRT decides; return (decision, wins, draws, losses, llr).
+
+    At most workers games are in flight, so little is wasted once the
+    test stops; games still running then are discarded. The decision is
+    None if max_games are played without one.
+    """
+    bounds = sprt_bounds(alpha, beta)
+    tally = [0, 0, 0]
+    llr = 0.0
+    decision = None
+    tasks = game_tasks(engine, opponent, max_games, openings)
+    log = open(output, 'a') if output else None
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        running = set()
+        while decision is None:
+            for index, white, black, opening in tasks:
+                running.add(executor.submit(play_game, index, white, black, opening, time_limit, max_plies))
+                if len(running) >= workers:
+                    break
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                tally[{1.0: 0, 0.5: 1, 0.0: 2}[engine_score(record, engine)]] += 1
+                llr = log_likelihood_ratio(*tally, elo0, elo1)
+                if decision is None:
+                    decision = sprt_decision(llr, bounds)
+                record['llr'] = llr
+                if log:
+                    log.write(json.dumps(record) + '\n')
+                    log.flush()
+                if progress:
+                    progress(record, *tally, llr, bounds)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if log:
+            log.close()
+    return decision, tally[0], tally[1], tally[2], llr
+
+def load_openings(filename):
+    """Openings from a file with one JSON list of moves per line."""
+    with open(filename) as f:
+        return [[tuple(move) for move in json.loads(line)] for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Test whether an engine change gains Elo, stopping as soon as the SPRT decides.")
+    parser.add_argument('engine', help="changed engine, e.g. 'ai:depth=6,pvs=True'")
+    parser.add_argument('opponent', help="baseline engine, in the same form")
+    parser.add_argument('--elo0', type=float, default=ELO0, help="Elo gain under H0")
+    parser.add_argument('--elo1', type=float, default=ELO1, help="Elo gain under H1")
+    parser.add_argument('--alpha', type=float, default=ALPHA, help="false positive rate")
+    parser.add_argument('--beta', type=float, default=BETA, help="false negative rate")
+    parser.add_argument('--max-games', type=int, default=MAX_GAMES, help="stop undecided after this many games")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--time-limit', type=float, help="seconds per move for both engines")
+    parser.add_argument('--openings', help="file of openings, one JSON move list per line; random if omitted")
+    parser.add_argument('--opening-plies', type=int, default=OPENING_PLIES, help="plies of each random opening")
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help="draw games that run longer")
+    parser.add_argument('--seed', type=int, help="seed for the random openings")
+    parser.add_argument('--output', default='sprt.jsonl', help="JSON Lines file the games are appended to")
+    args = parser.parse_args()
+    if args.engine == args.opponent:
+        parser.error("the two engine specs must differ")
+    if args.elo1 <= args.elo0:
+        parser.error("--elo1 must be greater than --elo0")
+    for spec in (args.engine, args.opponent):
+        try:
+            parse_engine(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.openings:
+        openings = load_openings(args.openings)
+    else:
+        openings = random_openings((args.max_games + 1) // 2, args.opening_plies, args.seed)
+    start = time.perf_counter()
+
+    def progress(record, wins, draws, losses, llr, bounds):
+        print(f"game {record['game']}: {record['result']}; {summary(wins, draws, losses)}; "
+              f"LLR {llr:.2f} ({bounds[0]:.2f}, {bounds[1]:.2f})", flush=True)
+
+    decision, wins, draws, losses, llr = run_sprt(
+        args.engine, args.opponent, args.workers, openings, args.elo0, args.elo1, args.alpha, args.beta,
+        args.max_games, args.time_limit, args.max_plies, args.output, progress)
+    print(f"\n{args.engine} vs {args.opponent} in {time.perf_counter() - start:.1f}s")
+    print(summary(wins, draws, losses))
+    if decision == ACCEPT:
+        print(f"H1 accepted: the change gains at least {args.elo1:g} Elo (LLR {llr:.2f})")
+    elif decision == REJECT:
+        print(f"H0 accepted: the change gains no more than {args.elo0:g} Elo (LLR {llr:.2f})")
+    else:
+        print(f"Undecided after {wins + draws + losses} games (LLR {llr:.2f})")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,56 @@
 # test_game.py
 
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
 import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
 from game_logic import Game
+import ai as ai_module
+from ai import AIPlayer
+from ai_worker import AIWorker
+import arena
+import benchmark_movegen
+from mcts import MCTSPlayer
+from move_ordering import MoveOrderer
+from opening_book import OpeningBook, build_book
+import perft
+from ponder import Ponderer
+from search_log import StatsLog, read_stats
+import sprt
+import endgame_tablebase
+try:
+    import numpy
+    import batch_eval
+    import batch_game
+except ImportError:
+    numpy = None
+from utils import (
+    adjacency_list, canonical_form, canonical_hash, check_mill, evaluate_board,
+    inverse_symmetries, line_terms, mills, mills_by_position, symmetry_permutations, transform_bitboard, transform_move
+)
+from transposition import TranspositionTable, EXACT, LOWER_BOUND
+
+def endgame_position(white, black, player='W'):
+    """A moving-phase game with pieces on the given positions and none in hand."""
+    game = Game()
+    board = [' '] * 24
+    for pos in white:
+        board[pos] = 'W'
+    for pos in black:
+        board[pos] = 'B'
+    game.board = board
+    game.white_pieces_in_hand = game.black_pieces_in_hand = 0
+    game.white_pieces_on_board, game.black_pieces_on_board = len(white), len(black)
+    game.update_phase()
+    game.current_player = player
+    game.compute_zobrist()
+    return game
 
 class TestGamePiecePlacement(unittest.TestCase):
     def test_piece_placement(self):
@@ -77,5 +126,754 @@ class TestGamePiecePlacement(unittest.TestCase):
         self.assertFalse(success)
         self.assertEqual(message, "No pieces left to place.")
 
+class TestBitboardState(unittest.TestCase):
+    def test_board_view_round_trip(self):
+        game = Game()
+        board = [' '] * 24
+        board[0], board[5], board[23] = 'W', 'B', 'W'
+        game.board = board
+        self.assertEqual(game.board, board)
+        self.assertEqual(game.pieces, [1 | 1 << 23, 1 << 5])
+
+    def test_moving_phase_moves_are_adjacent(self):
+        game = Game()
+        board = [' '] * 24
+        for pos in (0, 1, 2, 4):
+            board[pos] = 'W'
+        for pos in (21, 22, 23, 19):
+            board[pos] = 'B'
+        game.board = board
+        game.white_pieces_in_hand = game.black_pieces_in_hand = 0
+        game.white_pieces_on_board = game.black_pieces_on_board = 4
+        game.update_phase()
+        moves = game.get_possible_moves('W')
+        self.assertIn(('move', 0, 9), moves)
+        self.assertIn(('move', 4, 3), moves)
+        self.assertNotIn(('move', 0, 3), moves)
+        self.assertEqual(len(moves), 5)
+
+class TestMakeUnmake(unittest.TestCase):
+    def test_unmake_restores_state(self):
+        rng = random.Random(7)
+        game = Game(record_game=True)
+        snapshots = []
+        for _ in range(60):
+            moves = game.get_possible_moves(game.current_player)
+            if game.is_over() or not moves:
+                break
+            snapshots.append(dict(game.to_dict(), move_history=list(game.move_history)))
+            game.make_move(rng.choice(moves))
+        while snapshots:
+            game.unmake_move()
+            self.assertEqual(game.to_dict(), snapshots.pop())
+        self.assertEqual(game.undo_stack, [])
+
+class TestZobristHash(unittest.TestCase):
+    def test_incremental_hash_matches_full_hash(self):
+        rng = random.Random(11)
+        game = Game()
+        for _ in range(80):
+            moves = game.get_possible_moves(game.current_player)
+            if game.is_over() or not moves:
+                break
+            game.make_move(rng.choice(moves))
+            self.assertEqual(game.zobrist_hash, Game.compute_zobrist(game))
+        while game.undo_stack:
+            game.unmake_move()
+        self.assertEqual(game.zobrist_hash, Game().zobrist_hash)
+
+    def test_transposed_move_orders_share_hash(self):
+        first, second = Game(), Game()
+        for pos in (0, 5, 9, 13):
+            first.place_piece(pos)
+        for pos in (9, 13, 0, 5):
+            second.place_piece(pos)
+        self.assertEqual(first.zobrist_hash, second.zobrist_hash)
+        second.switch_player()
+        self.assertNotEqual(first.zobrist_hash, second.zobrist_hash)
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_store_and_probe(self):
+        table = TranspositionTable(size_mb=1)
+        table.store(12345, 3, EXACT, 7, ('place', 4))
+        self.assertEqual(table.probe(12345), (3, EXACT, 7, ('place', 4)))
+        self.assertIsNone(table.probe(54321))
+        self.assertEqual(table.hits, 1)
+
+    def test_deeper_entry_survives_shallow_store(self):
+        table = TranspositionTable(size_mb=1)
+        step = table.bucket_count
+        deep, shallow, newer = 5, 5 + step, 5 + 2 * step
+        table.store(deep, 6, EXACT, 1, None)
+        table.store(shallow, 1, LOWER_BOUND, 2, None)
+        table.store(newer, 2, LOWER_BOUND, 3, None)
+        self.assertIsNotNone(table.probe(deep))
+        self.assertIsNone(table.probe(shallow))
+        self.assertIsNotNone(table.probe(newer))
+        self.assertEqual(table.collisions, 1)
+        self.assertEqual(len(table.slots), 2 * table.bucket_count)
+
+class TestIterativeDeepening(unittest.TestCase):
+    def test_node_budget_stops_search_and_restores_game(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        before = game.to_dict()
+        ai = AIPlayer(depth=20, node_limit=2000)
+        move = ai.get_move(game)
+        self.assertIn(move, game.get_possible_moves('W'))
+        self.assertLessEqual(ai.nodes, 2000)
+        self.assertLess(ai.last_search['depth'], 20)
+        self.assertEqual(game.to_dict(), before)
+        self.assertEqual(game.undo_stack, [])
+
+    def test_completes_open_mill(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        ai = AIPlayer(depth=2, time_limit=5)
+        move = ai.get_move(game)
+        self.assertEqual(move[:3], ('place', 2, 'remove'))
+        self.assertIn(move[3], (3, 4))
+
+    def test_pvs_matches_minimax_score(self):
+        game = Game()
+        for pos in (0, 3, 1, 4, 9, 13, 22):
+            game.place_piece(pos)
+        for tt_size_mb in (0, 16):
+            minimax = AIPlayer(depth=4, tt_size_mb=tt_size_mb)
+            minimax.get_move(game)
+            pvs = AIPlayer(depth=4, tt_size_mb=tt_size_mb, pvs=True)
+            move = pvs.get_move(game)
+            self.assertIn(move, game.get_possible_moves('B'))
+            self.assertEqual(pvs.last_search['score'], minimax.last_search['score'])
+            self.assertIn('researches', pvs.last_search)
+
+    def test_quiescence_sees_mill_past_horizon(self):
+        game = Game()
+        for pos in (0, 3, 1, 13, 9):
+            game.place_piece(pos)  # W threatens mills at 2 and 21; B can block only one
+        plain = AIPlayer(depth=1)
+        plain.get_move(game)
+        deeper = AIPlayer(depth=2)
+        deeper.get_move(game)
+        for pvs in (False, True):
+            quiet = AIPlayer(depth=1, quiescence=True, pvs=pvs)
+            quiet.get_move(game)
+            self.assertEqual(quiet.last_search['score'], deeper.last_search['score'])
+            self.assertLess(quiet.last_search['score'], plain.last_search['score'])
+            self.assertGreater(quiet.last_search['quiescence_nodes'], 0)
+
+    def test_moving_phase_pruning_saves_nodes(self):
+        game = endgame_position([0, 1, 9, 4, 12, 19], [2, 3, 14, 21, 17, 23])
+        plain = AIPlayer(depth=5)
+        plain.get_move(game)
+        pruned = AIPlayer(depth=5, late_move_reductions=True, futility_pruning=True)
+        move = pruned.get_move(game)
+        self.assertIn(move, game.get_possible_moves('W'))
+        self.assertLess(pruned.nodes, plain.nodes)
+        self.assertGreater(pruned.last_search['pruning']['reductions'], 0)
+        self.assertGreater(pruned.last_search['pruning']['futility'], 0)
+        self.assertNotIn('pruning', plain.last_search)
+
+class TestSearchStats(unittest.TestCase):
+    def test_stats_describe_search_and_stream_to_jsonl(self):
+        game = Game()
+        for pos in (0, 3, 1, 4, 9, 13):
+            game.place_piece(pos)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'stats.jsonl')
+            log = StatsLog(filename)
+            ai = AIPlayer(depth=4, stats_hook=log)
+            ai.get_move(game)
+            ai.get_move(game)
+            log.close()
+            records = read_stats(filename)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[-1]['nodes'], ai.last_search['nodes'])
+        stats = records[0]
+        self.assertEqual(len(stats['ply_nodes']), 5)
+        self.assertEqual(stats['ply_nodes'][1], len(game.get_possible_moves('W')))
+        self.assertEqual(len(stats['branching_factors']), 4)
+        self.assertEqual(len(stats['depth_times']), 4)
+        self.assertGreater(stats['leaf_evaluations'], 0)
+        self.assertGreater(stats['beta_cutoffs'], 0)
+        self.assertTrue(0 < stats['first_move_cutoff_rate'] <= 1)
+        self.assertGreater(stats['tt']['hit_rate'], 0)
+
+class TestParallelRootSearch(unittest.TestCase):
+    def test_parallel_search_finds_the_same_score(self):
+        game = Game()
+        for pos in (0, 3, 1, 4, 9, 13):
+            game.place_piece(pos)
+        sequential = AIPlayer(depth=3)
+        sequential.get_move(game)
+        parallel = AIPlayer(depth=3, workers=2)
+        try:
+            move = parallel.get_move(game)
+        finally:
+            parallel.close()
+        self.assertIn(move, game.get_possible_moves('W'))
+        self.assertEqual(parallel.last_search['score'], sequential.last_search['score'])
+        self.assertEqual(parallel.last_search['parallel']['workers'], 2)
+        self.assertGreater(parallel.last_search['parallel']['utilization'], 0)
+
+    def test_tight_node_limit_completes_first_iteration(self):
+        game = Game()
+        parallel = AIPlayer(depth=4, node_limit=1, workers=2)
+        try:
+            move = parallel.get_move(game)
+        finally:
+            parallel.close()
+        self.assertIn(move, game.get_possible_moves('W'))
+        self.assertEqual(parallel.last_search['depth'], 1)
+        self.assertIsNotNone(parallel.last_search['score'])
+
+    def test_workers_start_a_new_search(self):
+        ai_module._init_root_worker({'depth': 2}, multiprocessing.Value('d', -math.inf))
+        state = Game().to_dict()
+        worker = ai_module._worker_ai
+        worker.orderer.history[('place', 0)] = 8
+        for search in (1, 1, 2):
+            ai_module._worker_alpha.value = -math.inf
+            ai_module._search_root_move(state, ('place', 0), 2, 'W', None, None, search)
+        self.assertEqual(worker.tt.generation, 2)
+        self.assertLessEqual(worker.orderer.history.get(('place', 0), 0), 2)
+
+    def test_fail_low_moves_never_win(self):
+        # Search the root moves in-process in reverse, so later moves see a raised alpha
+        rng = random.Random(11)
+        for pvs in (False, True):
+            ai_module._init_root_worker({'depth': 3, 'tt_size_mb': 0, 'pvs': pvs}, multiprocessing.Value('d', -math.inf))
+            for _ in range(15):
+                game = Game()
+                for _ in range(rng.randrange(4, 12)):
+                    game.make_move(rng.choice(game.get_possible_moves(game.current_player)))
+                state = game.to_dict()
+                player = game.current_player
+                moves = game.get_possible_moves(player)
+                exact = {}
+                for move in moves:
+                    ai_module._worker_alpha.value = -math.inf
+                    exact[move] = ai_module._search_root_move(state, move, 3, player, None, None)[1]
+                ai_module._worker_alpha.value = -math.inf
+                results = {}
+                for move in reversed(moves):
+                    _, score, alpha = ai_module._search_root_move(state, move, 3, player, None, None)[:3]
+                    results[move] = (score, alpha)
+                best_move, score = ai_module.pick_root_move(moves, results)
+                self.assertEqual(score, max(exact.values()))
+                self.assertEqual(exact[best_move], score)
+
+class TestMCTSPlayer(unittest.TestCase):
+    def test_finds_winning_mill(self):
+        game = endgame_position([0, 1, 23], [5, 14, 20])
+        move = MCTSPlayer(playouts=1000, seed=0).get_move(game)
+        self.assertEqual(move[:3], ('move', 23, 2))
+        self.assertEqual(move[3], 'remove')
+
+    def test_tiny_budget_still_moves(self):
+        game = Game()
+        self.assertIn(MCTSPlayer(playouts=None, time_limit=1e-9).get_move(game), game.get_possible_moves('W'))
+        player = MCTSPlayer(playouts=0, time_limit=1e-9, workers=2)
+        try:
+            self.assertIn(player.get_move(game), game.get_possible_moves('W'))
+        finally:
+            player.close()
+
+    def test_reuses_tree_between_turns(self):
+        game = Game()
+        player = MCTSPlayer(playouts=400, seed=3)
+        move = player.get_move(game)
+        chosen = next(child for child in player.root.children if child.move == move)
+        reply = max(chosen.children, key=lambda child: child.visits)
+        reply_visits = reply.visits
+        game.make_move(move)
+        game.make_move(reply.move)
+        player.get_move(game)
+        self.assertGreater(reply_visits, 0)
+        self.assertEqual(player.last_search['reused_visits'], reply_visits)
+        self.assertIs(player.root, reply)
+        self.assertEqual(reply.visits, reply_visits + 400)
+
+    def test_time_budget_and_root_parallel(self):
+        game = Game()
+        timed = MCTSPlayer(playouts=None, time_limit=0.1, seed=4)
+        self.assertIn(timed.get_move(game), game.get_possible_moves('W'))
+        self.assertGreater(timed.last_search['playouts'], 0)
+        parallel = MCTSPlayer(playouts=100, workers=2, seed=5)
+        try:
+            move = parallel.get_move(game)
+        finally:
+            parallel.close()
+        self.assertIn(move, game.get_possible_moves('W'))
+        self.assertEqual(parallel.last_search['workers'], 2)
+
+class TestPonderer(unittest.TestCase):
+    def test_answers_predicted_move_from_table(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        ponderer = Ponderer(AIPlayer(depth=3), predictions=2)
+        ponderer.start(game)
+        ponderer.wait()
+        self.assertEqual(len(ponderer.predicted), 2)
+        self.assertEqual(len(ponderer.table), 2)
+        game.make_move(ponderer.predicted[0])
+        move = ponderer.take(game)
+        self.assertEqual(move, ponderer.table[game.zobrist_hash])
+        self.assertIn(move, game.get_possible_moves('B'))
+        game.unmake_move()
+        unexpected = next(move for move in game.get_possible_moves('W') if move not in ponderer.predicted)
+        game.make_move(unexpected)
+        self.assertIsNone(ponderer.take(game))
+        self.assertEqual((ponderer.hits, ponderer.misses), (1, 1))
+
+    def test_stop_aborts_long_search(self):
+        ponderer = Ponderer(AIPlayer(depth=30, time_limit=60), predictions=1)
+        ponderer.start(Game())
+        while ponderer.searching is None:
+            ponderer.thread.join(0.01)
+        ponderer.stop()
+        self.assertIsNone(ponderer.thread)
+        self.assertEqual(ponderer.table, {})
+
+class TestAIWorker(unittest.TestCase):
+    def test_delivers_move_through_queue(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        before = game.to_dict()
+        worker = AIWorker(AIPlayer(depth=3))
+        worker.start(game)
+        worker.thread.join(30)
+        done, move = worker.poll()
+        self.assertTrue(done)
+        self.assertEqual(move, AIPlayer(depth=3).get_move(game))
+        self.assertEqual(game.to_dict(), before)
+        self.assertEqual(worker.poll(), (False, None))
+
+    def test_cancelled_search_is_dropped(self):
+        worker = AIWorker(AIPlayer(depth=30, time_limit=60))
+        token = worker.start(Game())
+        token.cancel()
+        worker.stop()
+        self.assertTrue(token.cancelled)
+        self.assertFalse(worker.busy)
+        self.assertEqual(worker.poll(), (False, None))
+
+class TestMoveOrdering(unittest.TestCase):
+    def test_mill_then_block_then_killer(self):
+        game = Game()
+        for pos in (0, 21, 1, 22):
+            game.place_piece(pos)
+        orderer = MoveOrderer()
+        orderer.record_cutoff(('place', 12), 0, 3, 2)
+        ordered = orderer.order(game, game.get_possible_moves('W'), 0, 0)
+        self.assertEqual(ordered[:4], [('place', 2, 'remove', 21), ('place', 2, 'remove', 22),
+                                       ('place', 23), ('place', 12)])
+        self.assertEqual(orderer.first_move_cutoff_rate, 0.0)
+
+    def test_search_counts_cutoffs(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        ai = AIPlayer(depth=3)
+        ai.get_move(game)
+        stats = ai.ordering_stats()
+        self.assertGreater(stats['cutoffs'], 0)
+        self.assertLessEqual(stats['first_move_cutoffs'], stats['cutoffs'])
+
+class TestMillTable(unittest.TestCase):
+    def test_sixteen_distinct_lines(self):
+        self.assertEqual(len(mills), 16)
+        self.assertEqual(len({frozenset(mill) for mill in mills}), 16)
+        for mill in mills:
+            # The ends of every line touch its middle point
+            self.assertIn(mill[1], adjacency_list[mill[0]])
+            self.assertIn(mill[1], adjacency_list[mill[2]])
+
+    def test_two_mills_per_position(self):
+        for pos in range(24):
+            self.assertEqual(len(mills_by_position[pos]), 2)
+
+    def test_check_mill_ignores_non_lines(self):
+        board = [' '] * 24
+        for pos in (15, 16, 19):
+            board[pos] = 'W'
+        self.assertFalse(check_mill(board, 16))
+        board[17] = 'W'
+        self.assertTrue(check_mill(board, 17))
+
+class TestIncrementalEvaluation(unittest.TestCase):
+    def test_features_match_full_evaluation(self):
+        rng = random.Random(5)
+        for _ in range(5):
+            game = Game()
+            for _ in range(120):
+                moves = game.get_possible_moves(game.current_player)
+                if game.is_over() or not moves:
+                    break
+                game.make_move(rng.choice(moves))
+                self.assertEqual(game.line_score, line_terms(game.pieces[0], game.pieces[1]))
+                for player in ('W', 'B'):
+                    self.assertEqual(game.evaluate(player), evaluate_board(game.board, player))
+            while game.undo_stack:
+                game.unmake_move()
+            self.assertEqual(game.line_score, 0)
+
+class TestCompoundMoves(unittest.TestCase):
+    def setUp(self):
+        # W: 0, 1 and 9 with B holding a mill on 21-22-23 plus a loose piece on 12
+        self.game = Game()
+        for pos in (0, 21, 1, 22, 9, 23, 10, 12):
+            self.game.current_player = 'W' if pos in (0, 1, 9, 10) else 'B'
+            self.game.place_piece(pos)
+        self.game.current_player = 'W'
+
+    def test_mill_moves_carry_each_legal_removal(self):
+        moves = self.game.get_possible_moves('W')
+        self.assertIn(('place', 2, 'remove', 12), moves)
+        self.assertNotIn(('place', 2), moves)
+        # Pieces in B's mill are protected while 12 is available
+        self.assertNotIn(('place', 2, 'remove', 21), moves)
+        self.assertIn(('place', 11, 'remove', 12), moves)
+
+    def test_all_pieces_in_mills_may_be_removed(self):
+        self.game.board = [' ' if pos == 12 else spot for pos, spot in enumerate(self.game.board)]
+        self.game.black_pieces_on_board -= 1
+        self.assertIn(('place', 2, 'remove', 21), self.game.get_possible_moves('W'))
+
+    def test_compound_move_switches_player_and_unmakes(self):
+        before = self.game.to_dict()
+        self.game.make_move(('place', 2, 'remove', 12))
+        self.assertEqual(self.game.board[12], ' ')
+        self.assertEqual(self.game.current_player, 'B')
+        self.game.unmake_move()
+        self.assertEqual(self.game.to_dict(), before)
+
+    def test_protected_piece_cannot_be_removed(self):
+        self.game.place_piece(2)
+        success, message = self.game.remove_piece(21)
+        self.assertFalse(success)
+        self.assertTrue(self.game.remove_piece(12)[0])
+
+    def test_generator_matches_closes_mill_scan(self):
+        rng = random.Random(5)
+        for _ in range(20):
+            game = Game()
+            while not game.check_win_condition() and len(game.undo_stack) < 60:
+                player = game.current_player
+                moves = game.get_possible_moves(player)
+                self.assertEqual(sorted(moves), sorted(benchmark_movegen.scan_moves(game, player)))
+                self.assertEqual(game.has_moves(game.turn), benchmark_movegen.scan_has_moves(game, game.turn))
+                game.make_move(rng.choice(moves))
+
+class TestSymmetry(unittest.TestCase):
+    def test_symmetries_preserve_lines_and_adjacency(self):
+        lines = {frozenset(mill) for mill in mills}
+        self.assertEqual(len({tuple(p) for p in symmetry_permutations}), 16)
+        for permutation in symmetry_permutations:
+            self.assertEqual({frozenset(permutation[pos] for pos in mill) for mill in mills}, lines)
+            for pos in range(24):
+                self.assertEqual({permutation[adj] for adj in adjacency_list[pos]},
+                                 set(adjacency_list[permutation[pos]]))
+
+    def test_symmetric_positions_share_canonical_hash(self):
+        rng = random.Random(3)
+        game = Game()
+        for _ in range(9):
+            game.make_move(rng.choice(game.get_possible_moves(game.current_player)))
+        key, transform = canonical_hash(game)
+        white, black, _ = canonical_form(game)
+        self.assertEqual(transform_bitboard(game.pieces[0], transform), white)
+        for symmetry in range(16):
+            image = Game()
+            image.from_dict(game.to_dict())
+            board = [' '] * 24
+            for pos, spot in enumerate(game.board):
+                board[symmetry_permutations[symmetry][pos]] = spot
+            image.board = board
+            self.assertEqual(canonical_hash(image)[0], key)
+
+    def test_transform_move_round_trip(self):
+        move = ('move', 4, 7, 'remove', 22)
+        for transform in range(16):
+            image = transform_move(move, transform)
+            self.assertEqual(transform_move(image, inverse_symmetries[transform]), move)
+
+class TestOpeningBook(unittest.TestCase):
+    def test_book_answers_symmetric_positions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'book.bin')
+            count = build_book(filename, plies=2, depth=1, tt_size_mb=1)
+            book = OpeningBook(filename)
+            try:
+                self.assertEqual(len(book), count)
+                self.assertIn(book.lookup(Game()), Game().get_possible_moves('W'))
+                # Every corner of the outer square is the same position after symmetry
+                for corner in (0, 2, 21, 23, 6, 8, 15, 17):
+                    game = Game()
+                    game.place_piece(corner)
+                    move = book.lookup(game)
+                    self.assertIn(move, game.get_possible_moves('B'))
+                    ai = AIPlayer(depth=1, book=book)
+                    self.assertEqual(ai.get_move(game), move)
+                    self.assertTrue(ai.last_search['book'])
+                game = Game()
+                for pos in (0, 1):
+                    game.place_piece(pos)
+                self.assertIsNone(book.lookup(game))
+            finally:
+                book.close()
+
+class TestEndgameTablebase(unittest.TestCase):
+    def random_positions(self, count):
+        rng = random.Random(9)
+        for _ in range(count):
+            squares = rng.sample(range(24), 9)
+            white_count = rng.randint(3, 5)
+            yield endgame_position(squares[:white_count], squares[white_count:white_count + rng.randint(3, 4)],
+                                   rng.choice('WB'))
+
+    def test_successors_match_game_moves(self):
+        for game in self.random_positions(40):
+            expected = []
+            for move in game.get_possible_moves(game.current_player):
+                game.make_move(move)
+                expected.append((game.pieces[0], game.pieces[1], move[-2] == 'remove'))
+                game.unmake_move()
+            actual = list(endgame_tablebase.successors(game.turn, game.pieces[0], game.pieces[1]))
+            self.assertEqual(sorted(actual), sorted(expected))
+
+    def test_predecessors_invert_quiet_moves(self):
+        for game in self.random_positions(40):
+            parent = (game.pieces[0], game.pieces[1])
+            for white, black, captured in endgame_tablebase.successors(game.turn, *parent):
+                if not captured:
+                    self.assertIn(parent, list(endgame_tablebase.predecessors(game.turn ^ 1, white, black)))
+
+    def test_generated_shard_matches_one_ply_search(self):
+        # Three pieces fly, so 3v3 confined to the outer square is a small game of its own
+        square = (0, 1, 2, 14, 23, 22, 21, 9)
+        mask = sum(1 << pos for pos in square)
+
+        def combination_masks(count):
+            return sorted(sum(1 << pos for pos in combo) for combo in itertools.combinations(square, count))
+
+        with mock.patch.object(endgame_tablebase, 'board_mask', mask), \
+                mock.patch.object(endgame_tablebase, 'combination_masks', combination_masks), \
+                tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as parallel_directory:
+            counts = endgame_tablebase.generate_shard(directory, 3, 3)
+            with ProcessPoolExecutor(2, initializer=endgame_tablebase._init_worker,
+                                     initargs=(parallel_directory, 3, 3)) as executor:
+                self.assertEqual(endgame_tablebase.generate_shard(parallel_directory, 3, 3, executor), counts)
+            filenames = [endgame_tablebase.shard_filename(path, 3, 3) for path in (directory, parallel_directory)]
+            with open(filenames[0], 'rb') as serial, open(filenames[1], 'rb') as parallel:
+                self.assertEqual(serial.read(), parallel.read())
+            self.assertGreater(counts[0], 0)
+            self.assertGreater(counts[1], 0)
+            tablebase = endgame_tablebase.EndgameTablebase(directory)
+            layout = endgame_tablebase.ShardLayout(3, 3)
+            try:
+                for index in range(layout.size):
+                    turn, white, black = layout.position(index)
+                    if white & black:
+                        continue
+                    game = endgame_position([pos for pos in square if white >> pos & 1],
+                                            [pos for pos in square if black >> pos & 1], 'WB'[turn])
+                    children = []
+                    for move in game.get_possible_moves(game.current_player):
+                        if move[2] not in square:
+                            continue
+                        game.make_move(move)
+                        if min(game.pieces_on_board) < 3:
+                            children.append(('loss', 0))
+                        else:
+                            children.append(endgame_tablebase.decode_value(
+                                tablebase.value(game.turn, game.pieces[0], game.pieces[1])))
+                        game.unmake_move()
+                    wins = [distance + 1 for outcome, distance in children if outcome == 'loss']
+                    if not children:
+                        expected = ('loss', 0)
+                    elif wins:
+                        expected = ('win', min(wins))
+                    elif all(outcome == 'win' for outcome, _ in children):
+                        expected = ('loss', max(distance + 1 for _, distance in children))
+                    else:
+                        expected = ('draw', 0)
+                    self.assertEqual(endgame_tablebase.decode_value(tablebase.value(turn, white, black)), expected)
+            finally:
+                tablebase.close()
+
+    def test_probe_reads_shard_with_colours_swapped(self):
+        layout = endgame_tablebase.ShardLayout(4, 3)
+        white, black = 0b111 << 9, 1 | 1 << 1 | 1 << 5 | 1 << 21
+        values = bytearray(layout.size)
+        values[layout.index(1, black, white)] = endgame_tablebase.loss_value(4)
+        with tempfile.TemporaryDirectory() as directory:
+            with open(endgame_tablebase.shard_filename(directory, 4, 3), 'wb') as f:
+                f.write(endgame_tablebase.SHARD_HEADER.pack(endgame_tablebase.SHARD_MAGIC, 4, 3, layout.size))
+                f.write(values)
+            tablebase = endgame_tablebase.EndgameTablebase(directory)
+            try:
+                game = endgame_position([9, 10, 11], [0, 1, 5, 21], 'W')
+                self.assertEqual(tablebase.probe(game), ('loss', 4))
+                game.current_player = 'B'
+                self.assertEqual(tablebase.probe(game), ('draw', 0))
+                self.assertIsNone(tablebase.probe(endgame_position([9, 10, 11], [0, 1, 5], 'W')))
+                self.assertIsNone(tablebase.probe(Game()))
+            finally:
+                tablebase.close()
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchEvaluation(unittest.TestCase):
+    def test_matches_scalar_evaluation(self):
+        rng = numpy.random.default_rng(4)
+        boards = rng.integers(0, 3, size=(500, 24), dtype=numpy.int8)
+        players = rng.choice(['W', 'B'], size=500)
+        symbols = {batch_eval.EMPTY: ' ', batch_eval.WHITE: 'W', batch_eval.BLACK: 'B'}
+        expected = [evaluate_board([symbols[value] for value in board], player)
+                    for board, player in zip(boards.tolist(), players)]
+        self.assertEqual(batch_eval.evaluate_boards(boards, players).tolist(), expected)
+        bitboards = batch_eval.pack_bitboards(boards)
+        self.assertEqual(batch_eval.evaluate_boards(bitboards, players).tolist(), expected)
+
+    def test_games_round_trip(self):
+        game = Game()
+        for pos in (0, 3, 1, 4):
+            game.place_piece(pos)
+        boards = batch_eval.boards_from_games([game, Game()])
+        self.assertEqual(boards.shape, (2, 24))
+        self.assertEqual(batch_eval.evaluate_boards(boards, 'B').tolist(), [game.evaluate('B'), 0])
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchGame(unittest.TestCase):
+    def test_lockstep_matches_game(self):
+        rng = numpy.random.default_rng(5)
+        batch = batch_game.BatchGame(24)
+        games = [Game() for _ in range(batch.count)]
+        for _ in range(150):
+            moves, closes, removable = batch.legal_moves()
+            self.assertEqual(batch.source_counts().tolist(), moves.sum(axis=2).tolist())
+            for index in numpy.flatnonzero(batch.active):
+                legal = set()
+                for source, destination in zip(*numpy.nonzero(moves[index])):
+                    removals = numpy.flatnonzero(removable[index]) if closes[index, source, destination] \
+                        else [batch_game.NO_REMOVAL]
+                    legal.update(batch.move_tuple(source, destination, removal) for removal in removals)
+                game = games[index]
+                self.assertEqual(legal, set(game.get_possible_moves(game.current_player)))
+            if not batch.active.any():
+                break
+            source, destination, removal = batch.random_moves(rng)
+            for index in numpy.flatnonzero(batch.active):
+                games[index].make_move(batch.move_tuple(source[index], destination[index], removal[index]))
+                games[index].check_win_condition()
+            batch.apply(source, destination, removal)
+            for index, game in enumerate(games):
+                winner = batch_game.NO_WINNER if game.winner is None else 'WB'.index(game.winner)
+                self.assertEqual(batch.winner[index], winner)
+                self.assertEqual(batch.game(index).board, game.board)
+                if winner == batch_game.NO_WINNER:
+                    self.assertEqual(batch.game(index).zobrist_hash, game.zobrist_hash)
+
+    def test_rejects_illegal_moves(self):
+        batch = batch_game.BatchGame(2)
+        batch.apply([batch_game.HAND] * 2, [0, 5], [batch_game.NO_REMOVAL] * 2)
+        with self.assertRaises(ValueError):
+            batch.apply([batch_game.HAND] * 2, [0, 1], [batch_game.NO_REMOVAL] * 2)
+        batch = batch_game.BatchGame(1)
+        for destination in (0, 3, 1, 4):
+            batch.apply([batch_game.HAND], [destination], [batch_game.NO_REMOVAL])
+        with self.assertRaises(ValueError):
+            batch.apply([batch_game.HAND], [2], [batch_game.NO_REMOVAL])
+
+    def test_play_random_finishes_every_game(self):
+        batch = batch_game.BatchGame(64)
+        winners = batch.play_random(numpy.random.default_rng(6), max_plies=120)
+        self.assertFalse(batch.active.any())
+        self.assertTrue(set(winners.tolist()) <= {0, 1, batch_game.DRAW})
+        self.assertTrue((batch.plies <= 120).all())
+
+class TestPerft(unittest.TestCase):
+    def test_start_position_counts(self):
+        game = Game()
+        self.assertEqual([perft.perft(game, depth) for depth in range(4)], [1, 24, 552, 12144])
+        self.assertEqual(game.board, [' '] * 24)
+
+    def test_divide_sums_to_perft(self):
+        game = perft.load_position('moving')
+        counts = perft.divide(game, 3)
+        self.assertEqual(set(counts), set(game.get_possible_moves(game.current_player)))
+        self.assertEqual(sum(counts.values()), perft.perft(game, 3))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_batch_backend_matches_game(self):
+        for name in perft.PERFT_POSITIONS:
+            game = perft.load_position(name)
+            batch = batch_game.BatchGame.from_games([game])
+            self.assertEqual(perft.batch_perft(batch, 3), perft.perft(game, 3), name)
+        game = perft.load_position('flying')
+        self.assertEqual(perft.batch_divide(game, 2), perft.divide(game, 2))
+
+class TestArena(unittest.TestCase):
+    def test_parse_engine(self):
+        self.assertEqual(arena.parse_engine('ai:depth=4,pvs=True'), ('ai', {'depth': 4, 'pvs': True}))
+        self.assertEqual(arena.parse_engine('mcts'), ('mcts', {}))
+        with self.assertRaises(ValueError):
+            arena.parse_engine('stockfish:depth=4')
+
+    def test_play_game_replays(self):
+        opening = arena.random_openings(1, seed=3)[0]
+        record = arena.play_game(0, 'ai:depth=1', 'ai:depth=2', opening, max_plies=40)
+        self.assertEqual(record['moves'][:len(opening)], [list(move) for move in opening])
+        self.assertTrue(record['movetext'].endswith(record['result']))
+        game = Game()
+        for move in record['moves']:
+            self.assertIn(tuple(move), game.get_possible_moves(game.current_player))
+            game.make_move(tuple(move))
+        game.check_win_condition()
+        if record['result'] != '1/2-1/2':
+            self.assertEqual(game.winner, 'WB'[record['result'] == '0-1'])
+
+    def test_colour_swapped_pairs(self):
+        tasks = list(arena.game_tasks('a', 'b', 4, [['x'], ['y']]))
+        self.assertEqual([task[1:] for task in tasks],
+                         [('a', 'b', ['x']), ('b', 'a', ['x']), ('a', 'b', ['y']), ('b', 'a', ['y'])])
+
+    def test_score_interval(self):
+        self.assertEqual(arena.score_interval(10, 0, 10), (0.5, arena.CONFIDENCE_Z * 0.5 / 20 ** 0.5))
+        self.assertAlmostEqual(arena.elo_difference(0.75), 190.85, places=2)
+
+class TestSPRT(unittest.TestCase):
+    def test_log_likelihood_ratio(self):
+        self.assertEqual(sprt.log_likelihood_ratio(0, 0, 0), 0.0)
+        self.assertGreater(sprt.log_likelihood_ratio(60, 20, 20), 0)
+        self.assertLess(sprt.log_likelihood_ratio(20, 20, 60), 0)
+        bounds = sprt.sprt_bounds()
+        self.assertEqual(sprt.sprt_decision(bounds[1], bounds), sprt.ACCEPT)
+        self.assertEqual(sprt.sprt_decision(bounds[0], bounds), sprt.REJECT)
+        self.assertIsNone(sprt.sprt_decision(0.0, bounds))
+
+    def test_one_sided_records_decide(self):
+        bounds = sprt.sprt_bounds()
+        self.assertEqual(sprt.sprt_decision(sprt.log_likelihood_ratio(40, 0, 0), bounds), sprt.ACCEPT)
+        self.assertEqual(sprt.sprt_decision(sprt.log_likelihood_ratio(0, 0, 40), bounds), sprt.REJECT)
+        self.assertEqual(sprt.sprt_decision(sprt.log_likelihood_ratio(0, 400, 0), bounds), sprt.REJECT)
+
+    def test_stops_once_decided(self):
+        openings = arena.random_openings(20, seed=2)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'sprt.jsonl')
+            decision, wins, draws, losses, llr = sprt.run_sprt(
+                'ai:depth=3', 'ai:depth=1', 1, openings, elo1=200, max_games=40, max_plies=80, output=output)
+            with open(output) as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual(decision, sprt.ACCEPT)
+        self.assertLess(wins + draws + losses, 40)
+        self.assertEqual(len(records), wins + draws + losses)
+        self.assertEqual(records[-1]['llr'], llr)
+
 if __name__ == '__main__':
     unittest.main()
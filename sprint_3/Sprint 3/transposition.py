@@ -0,0 +1,93 @@
+#transposition.py
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Rough CPython footprint of one stored entry (tuple, key, score and move)
+ENTRY_BYTES = 200
+
+
+class TranspositionTable:
+    """Fixed-size hash table of searched positions.
+
+    Slots live in one preallocated list. Each bucket has two slots: the first
+    keeps the deepest result seen (or anything from an older search), the
+    second is overwritten by every store that does not win the first.
+    """
+
+    def __init__(self, size_mb=16):
+        buckets = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_BYTES))
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.index_mask = self.bucket_count - 1
+        self.size_mb = size_mb
+        self.slots = [None] * (2 * self.bucket_count)
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the probe counters."""
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        """Drop every stored entry."""
+        self.slots = [None] * (2 * self.bucket_count)
+        self.reset_stats()
+
+    def new_search(self):
+        """Age existing entries so that a new search may replace them."""
+        self.generation += 1
+
+    def probe(self, key):
+        """Return (depth, bound, score, move) for key, or None."""
+        self.probes += 1
+        index = (key & self.index_mask) << 1
+        occupied = False
+        for slot in (index, index + 1):
+            entry = self.slots[slot]
+            if entry is not None:
+                if entry[0] == key:
+                    self.hits += 1
+                    return entry[1:5]
+                occupied = True
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """Store a search result, keeping the deeper one in the first slot."""
+        self.stores += 1
+        index = (key & self.index_mask) << 1
+        entry = (key, depth, bound, score, move, self.generation)
+        preferred = self.slots[index]
+        if (preferred is None or preferred[0] == key or depth >= preferred[1]
+                or preferred[5] != self.generation):
+            if preferred is not None and preferred[0] != key:
+                self.slots[index + 1] = preferred
+            self.slots[index] = entry
+        else:
+            self.slots[index + 1] = entry
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    @property
+    def collision_rate(self):
+        return self.collisions / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """Summary of table usage since the last reset."""
+        return {
+            'size_mb': self.size_mb,
+            'slots': len(self.slots),
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hit_rate,
+            'collisions': self.collisions,
+            'collision_rate': self.collision_rate,
+            'stores': self.stores,
+        }
@@ -1,4 +1,6 @@
 #utils.py
+import random
+
 # Define the adjacency list for the board positions
 adjacency_list = {
     0: [1, 9],
@@ -27,11 +29,13 @@ adjacency_list = {
     23: [14, 22]
 }
 
-# Define all possible mills (three in a row)
+# Define all possible mills (three in a row): eight rows and eight columns
 mills = [
     [0, 1, 2],
     [3, 4, 5],
     [6, 7, 8],
+    [9, 10, 11],
+    [12, 13, 14],
     [15, 16, 17],
     [18, 19, 20],
     [21, 22, 23],
@@ -42,21 +46,106 @@ mills = [
     [16, 19, 22],
     [8, 12, 17],
     [5, 13, 20],
-    [2, 14, 23],
-    [9, 10, 11],
-    [12, 13, 14],
-    [19, 16, 15],
-    [19, 22, 23],
-    [21, 9, 0],
-    [18, 10, 3],
-    [15, 11, 6],
-    [7, 4, 1],
-    [22, 19, 16],
-    [17, 12, 8],
-    [20, 13, 5],
-    [23, 14, 2]
+    [2, 14, 23]
 ]
 
+# The two mills through each position
+mills_by_position = [[mill for mill in mills if pos in mill] for pos in range(24)]
+
+# Bitboard tables: bit i of a mask stands for board position i
+board_mask = (1 << 24) - 1
+position_masks = [1 << pos for pos in range(24)]
+adjacency_masks = [sum(1 << adj for adj in adjacency_list[pos]) for pos in range(24)]
+mill_masks = [sum(1 << pos for pos in mill) for mill in mills]
+position_mill_masks = [[mask for mask in mill_masks if mask >> pos & 1] for pos in range(24)]
+# The positions on the two mills through each position
+position_line_masks = [position_mill_masks[pos][0] | position_mill_masks[pos][1] for pos in range(24)]
+# The other two positions of each mill through a position
+mill_partner_masks = [[mask ^ position_masks[pos] for mask in position_mill_masks[pos]] for pos in range(24)]
+
+def _byte_table(item):
+    """table[byte][value]: tuple of item(position) for the positions set in that byte of a bitboard."""
+    return [[tuple(item(8 * byte + bit) for bit in range(8) if value >> bit & 1) for value in range(256)]
+            for byte in range(3)]
+
+# Move generation reads bitboards a byte at a time from these tables instead of looping over bits
+position_bytes = _byte_table(lambda pos: pos)
+place_move_bytes = _byte_table(lambda pos: ('place', pos))
+move_tuples = [[('move', src, dst) for dst in range(24)] for src in range(24)]
+move_bytes = [_byte_table(lambda dst, src=src: move_tuples[src][dst]) for src in range(24)]
+# Positions next to any position set in a byte
+neighbour_bytes = [[0] * 256 for _ in range(3)]
+for _byte in range(3):
+    for _value in range(256):
+        for _pos in position_bytes[_byte][_value]:
+            neighbour_bytes[_byte][_value] |= adjacency_masks[_pos]
+
+# Evaluation weights
+PIECE_WEIGHT = 10
+MILL_WEIGHT = 20
+OPEN_TWO_WEIGHT = 4
+BLOCKED_WEIGHT = 3
+
+# Zobrist keys for hashing positions; the fixed seed keeps hashes stable between runs
+_zobrist_random = random.Random(0x4E4D4D)
+zobrist_pieces = [[_zobrist_random.getrandbits(64) for _ in range(24)] for _ in range(2)]
+zobrist_hand = [[_zobrist_random.getrandbits(64) for _ in range(10)] for _ in range(2)]
+zobrist_flying = [_zobrist_random.getrandbits(64) for _ in range(2)]
+zobrist_side = _zobrist_random.getrandbits(64)
+
+def iter_bits(mask):
+    """Yield the board positions set in a bitboard, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def bit_positions(mask):
+    """Tuple of the board positions set in a bitboard, lowest first."""
+    return position_bytes[0][mask & 255] + position_bytes[1][mask >> 8 & 255] + position_bytes[2][mask >> 16]
+
+def neighbours(mask):
+    """Bitboard of the positions next to any position set in mask."""
+    return neighbour_bytes[0][mask & 255] | neighbour_bytes[1][mask >> 8 & 255] | neighbour_bytes[2][mask >> 16]
+
+def mill_completions(pieces, empty):
+    """Empty positions where one more of these pieces would complete a mill."""
+    completions = 0
+    for mask in mill_masks:
+        line = pieces & mask
+        # Two of the three positions: not all three, and more than one bit set
+        if line != mask and line & (line - 1):
+            completions |= mask ^ line
+    return completions & empty
+
+def position_hash(white, black, turn, pieces_in_hand, flying):
+    """Zobrist hash of a position given as bitboards, side to move, hands and flying flags."""
+    key = zobrist_side if turn else 0
+    for pos in iter_bits(white):
+        key ^= zobrist_pieces[0][pos]
+    for pos in iter_bits(black):
+        key ^= zobrist_pieces[1][pos]
+    key ^= zobrist_hand[0][pieces_in_hand[0]] ^ zobrist_hand[1][pieces_in_hand[1]]
+    if flying[0]:
+        key ^= zobrist_flying[0]
+    if flying[1]:
+        key ^= zobrist_flying[1]
+    return key
+
+def board_to_bitboards(board):
+    """Convert a 24-character board list to (white, black) bitboards."""
+    white = black = 0
+    for pos, spot in enumerate(board):
+        if spot == 'W':
+            white |= 1 << pos
+        elif spot == 'B':
+            black |= 1 << pos
+    return white, black
+
+def bitboards_to_board(white, black):
+    """Convert (white, black) bitboards back to a 24-character board list."""
+    return ['W' if white >> pos & 1 else 'B' if black >> pos & 1 else ' ' for pos in range(24)]
+
 def is_adjacent(pos1, pos2):
     """Check if two positions are adjacent."""
     return pos2 in adjacency_list[pos1]
@@ -64,8 +153,8 @@ def is_adjacent(pos1, pos2):
 def check_mill(board, position):
     """Check if placing a piece at 'position' forms a mill."""
     player = board[position]
-    for mill in mills:
-        if position in mill and all(board[pos] == player for pos in mill):
+    for mill in mills_by_position[position]:
+        if all(board[pos] == player for pos in mill):
             return True
     return False
 
@@ -73,14 +162,181 @@ def count_pieces(board, player):
     """Count the number of pieces a player has on the board."""
     return board.count(player)
 
+def local_features(first, second, line_masks, points):
+    """Count evaluation features of two bitboards within some lines and points.
+
+    Returns [mills, mills, open twos, open twos, blocked, blocked] with the
+    first player's count before the second's in each pair. An open two is a
+    line holding two pieces of one player and an empty square; a blocked
+    piece has no empty adjacent square.
+    """
+    features = [0, 0, 0, 0, 0, 0]
+    for mask in line_masks:
+        own = first & mask
+        other = second & mask
+        if own == mask:
+            features[0] += 1
+        elif other == mask:
+            features[1] += 1
+        elif not other:
+            if own.bit_count() == 2:
+                features[2] += 1
+        elif not own:
+            if other.bit_count() == 2:
+                features[3] += 1
+    empty = board_mask & ~(first | second)
+    for pos in iter_bits(points & (first | second)):
+        if not adjacency_masks[pos] & empty:
+            if first >> pos & 1:
+                features[4] += 1
+            else:
+                features[5] += 1
+    return features
+
+def line_terms(first, second, line_masks=mill_masks):
+    """The mill and open-two part of score_features for the first player, over some lines."""
+    features = local_features(first, second, line_masks, 0)
+    return MILL_WEIGHT * (features[0] - features[1]) + OPEN_TWO_WEIGHT * (features[2] - features[3])
+
+def _line_term_deltas(player_index, position):
+    """{occupancy key: change of White's line terms} for toggling a piece of player_index on position.
+
+    The key is (white & mask) | (black & mask) << 24 before the toggle, with
+    mask the two mills through position.
+    """
+    lines = position_mill_masks[position]
+    points = list(iter_bits(position_line_masks[position]))
+    deltas = {}
+    for state in range(3 ** len(points)):
+        white = black = 0
+        for pos in points:
+            state, owner = divmod(state, 3)
+            if owner == 1:
+                white |= 1 << pos
+            elif owner == 2:
+                black |= 1 << pos
+        if (black, white)[player_index] >> position & 1:
+            continue  # The other player's piece is there
+        before = line_terms(white, black, lines)
+        if player_index:
+            after = line_terms(white, black ^ 1 << position, lines)
+        else:
+            after = line_terms(white ^ 1 << position, black, lines)
+        deltas[white | black << 24] = after - before
+    return deltas
+
+# line_term_deltas[player_index][position], so the line terms follow each piece toggled
+line_term_deltas = [[_line_term_deltas(player_index, pos) for pos in range(24)] for player_index in range(2)]
+
+def blocked_difference(first, second):
+    """First player's blocked pieces minus the second's, counted with masks."""
+    free = neighbours(board_mask & ~(first | second))
+    return (first & ~free).bit_count() - (second & ~free).bit_count()
+
+def board_features(first, second):
+    """Evaluation features of a whole position, as returned by local_features."""
+    return local_features(first, second, mill_masks, board_mask)
+
+def score_features(own_pieces, opponent_pieces, features):
+    """Combine piece counts and a feature list into a score for the first player."""
+    return (PIECE_WEIGHT * (own_pieces - opponent_pieces)
+            + MILL_WEIGHT * (features[0] - features[1])
+            + OPEN_TWO_WEIGHT * (features[2] - features[3])
+            - BLOCKED_WEIGHT * (features[4] - features[5]))
+
+def evaluate_bitboards(own, opponent):
+    """Heuristic evaluation of a pair of bitboards from the owner's point of view."""
+    return score_features(own.bit_count(), opponent.bit_count(), board_features(own, opponent))
+
 def evaluate_board(board, player):
     """Heuristic evaluation of the board for the AI."""
-    opponent = 'W' if player == 'B' else 'B'
-    player_pieces = count_pieces(board, player)
-    opponent_pieces = count_pieces(board, opponent)
-    player_mills = sum(1 for mill in mills if all(board[pos] == player for pos in mill))
-    opponent_mills = sum(1 for mill in mills if all(board[pos] == opponent for pos in mill))
-    return (player_pieces - opponent_pieces) + (player_mills - opponent_mills) * 2
+    white, black = board_to_bitboards(board)
+    if player == 'W':
+        return evaluate_bitboards(white, black)
+    return evaluate_bitboards(black, white)
+
+# Board symmetries: 4 rotations x mirror x swapping the inner and outer squares.
+# Positions sit on a 7x7 grid; the square a point lies on is its distance from the centre.
+board_coordinates = [
+    (0, 0), (3, 0), (6, 0), (1, 1), (3, 1), (5, 1), (2, 2), (3, 2), (4, 2),
+    (0, 3), (1, 3), (2, 3), (4, 3), (5, 3), (6, 3),
+    (2, 4), (3, 4), (4, 4), (1, 5), (3, 5), (5, 5), (0, 6), (3, 6), (6, 6)
+]
+
+def _swap_squares(coordinate):
+    """Swap the inner and outer square along one grid coordinate."""
+    if coordinate == 3:
+        return coordinate
+    distance = abs(coordinate - 3)
+    return 3 + (4 - distance) * (1 if coordinate > 3 else -1)
+
+def _symmetry_permutation(transform):
+    """Where each position goes under transform (bits 0-1 rotate, bit 2 mirrors, bit 3 swaps squares)."""
+    index = {coords: pos for pos, coords in enumerate(board_coordinates)}
+    permutation = []
+    for x, y in board_coordinates:
+        if transform & 8:
+            x, y = _swap_squares(x), _swap_squares(y)
+        if transform & 4:
+            x = 6 - x
+        for _ in range(transform & 3):
+            x, y = 6 - y, x
+        permutation.append(index[(x, y)])
+    return permutation
+
+symmetry_permutations = [_symmetry_permutation(transform) for transform in range(16)]
+inverse_symmetries = [
+    next(other for other in range(16)
+         if all(symmetry_permutations[other][symmetry_permutations[transform][pos]] == pos for pos in range(24)))
+    for transform in range(16)
+]
+# Per-byte lookup tables so that a bitboard is permuted with three table reads
+symmetry_byte_tables = [
+    [[sum(1 << permutation[shift + bit] for bit in range(8) if value >> bit & 1) for value in range(256)]
+     for shift in (0, 8, 16)]
+    for permutation in symmetry_permutations
+]
+
+def transform_bitboard(mask, transform):
+    """Apply a board symmetry to a bitboard."""
+    low, middle, high = symmetry_byte_tables[transform]
+    return low[mask & 255] | middle[mask >> 8 & 255] | high[mask >> 16]
+
+def transform_move(move, transform):
+    """Apply a board symmetry to the positions named in a move."""
+    permutation = symmetry_permutations[transform]
+    return tuple(permutation[part] if isinstance(part, int) else part for part in move)
+
+def canonical_bitboards(white, black):
+    """Return (white, black, transform) for the smallest symmetric image of the bitboards."""
+    best = None
+    for transform in range(16):
+        low, middle, high = symmetry_byte_tables[transform]
+        image_white = low[white & 255] | middle[white >> 8 & 255] | high[white >> 16]
+        image_black = low[black & 255] | middle[black >> 8 & 255] | high[black >> 16]
+        image = image_white | image_black << 24
+        if best is None or image < best:
+            best = image
+            best_transform = transform
+    return best & board_mask, best >> 24, best_transform
+
+def canonical_form(game):
+    """Map a game position to its canonical symmetric image.
+
+    Returns (white, black, transform): transform takes the game's board to
+    the canonical one, and inverse_symmetries[transform] takes it back.
+    """
+    return canonical_bitboards(game.pieces[0], game.pieces[1])
+
+def canonical_hash(game):
+    """Zobrist hash of the canonical image of a game position, plus the transform used.
+
+    Symmetric positions with the same side to move, hands and flying phases
+    share this key, so caches and books can store them once.
+    """
+    white, black, transform = canonical_form(game)
+    flying = (game.white_phase == 3, game.black_phase == 3)
+    return position_hash(white, black, game.turn, game.pieces_in_hand, flying), transform
 
 def print_board(board):
     """Print the board to the console."""